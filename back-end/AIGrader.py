@@ -1,37 +1,51 @@
 from crewai import Agent, Task, Crew, Process
 import os
 import base64
-import openlit
 import json_repair
 import json
-from langfuse.openai import openai
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from types import SimpleNamespace
 from pydantics import (
     RequirementsConfig,
     QualityScoringConfig,
     ScopeConfig,
     ScopeScoringConfig,
 )
+from helpers.cache import LRUCache, SQLiteCache, TieredCache, content_hash
+from helpers.metrics import in_context, record_usage, span
 
 
+# Langfuse tracing (openlit over OpenTelemetry) is only set up when its keys are
+# configured, local runs need neither the cloud exporter nor the packages
+LANGFUSE_SECRET_KEY = os.getenv("LANGFUSE_SECRET_KEY", "")
+LANGFUSE_PUBLIC_KEY = os.getenv("LANGFUSE_PUBLIC_KEY", "")
+LANGFUSE_HOST = os.getenv("LANGFUSE_HOST", "https://us.cloud.langfuse.com")
+LANGFUSE_ENABLED = bool(LANGFUSE_SECRET_KEY and LANGFUSE_PUBLIC_KEY)
 
-LANGFUSE_SECRET_KEY = "sk-lf-b90245cc-b297-4599-82fa-ca89aa50ddca"
-LANGFUSE_PUBLIC_KEY = "pk-lf-1406ba99-9e8e-4316-bd38-baa13a1e8020"
-LANGFUSE_HOST = "https://us.cloud.langfuse.com"
-os.environ["LANGFUSE_SECRET_KEY"] = LANGFUSE_SECRET_KEY
-os.environ["LANGFUSE_PUBLIC_KEY"] = LANGFUSE_PUBLIC_KEY
-os.environ["LANGFUSE_HOST"] = LANGFUSE_HOST
+if LANGFUSE_ENABLED:
+    try:
+        import openlit
+        from langfuse.openai import openai
 
-LANGFUSE_AUTH = base64.b64encode(
-    f"{LANGFUSE_PUBLIC_KEY}:{LANGFUSE_SECRET_KEY}".encode()
-).decode()
+        LANGFUSE_AUTH = base64.b64encode(
+            f"{LANGFUSE_PUBLIC_KEY}:{LANGFUSE_SECRET_KEY}".encode()
+        ).decode()
+        os.environ["LANGFUSE_HOST"] = LANGFUSE_HOST
+        os.environ.setdefault(
+            "OTEL_EXPORTER_OTLP_ENDPOINT", f"{LANGFUSE_HOST}/api/public/otel"
+        )
+        os.environ.setdefault(
+            "OTEL_EXPORTER_OTLP_HEADERS", f"Authorization=Basic {LANGFUSE_AUTH}"
+        )
+        openlit.init()
+    except ImportError as e:
+        print(f"Langfuse tracing disabled, missing package: {e}")
+        LANGFUSE_ENABLED = False
 
-# os.environ["OTEL_EXPORTER_OTLP_ENDPOINT"] = "https://cloud.langfuse.com/api/public/otel"
-# US data region
-os.environ["OTEL_EXPORTER_OTLP_ENDPOINT"] = (
-    "https://us.cloud.langfuse.com/api/public/otel"
-)
-os.environ["OTEL_EXPORTER_OTLP_HEADERS"] = f"Authorization=Basic {LANGFUSE_AUTH}"
-openlit.init()
+if not LANGFUSE_ENABLED:
+    import openai
 
 
 OPENAI_API_KEY = os.environ.get("OPENAI_API_KEY", "")
@@ -40,27 +54,135 @@ os.environ["OPENAI_API_KEY"] = OPENAI_API_KEY
 
 client = openai.OpenAI(api_key=OPENAI_API_KEY)
 
+# Parsed task requirements/deliverables only depend on the task description and
+# journey, so they are shared by every submission of the same task.
+# Set TASK_PARSE_CACHE_DB to a file path to also keep them across restarts.
+TASK_PARSE_CACHE_SIZE = int(os.getenv("TASK_PARSE_CACHE_SIZE", 128))
+TASK_PARSE_CACHE_DB = os.getenv("TASK_PARSE_CACHE_DB", "")
+
+task_parse_cache = TieredCache(
+    LRUCache(maxsize=TASK_PARSE_CACHE_SIZE),
+    (
+        SQLiteCache(TASK_PARSE_CACHE_DB, table="task_parse_cache")
+        if TASK_PARSE_CACHE_DB
+        else None
+    ),
+)
+
+
+# Run the quality and scope scoring chains concurrently inside process_tasks
+GRADER_PARALLEL_SCORING = (
+    os.getenv("GRADER_PARALLEL_SCORING", "true").lower() == "true"
+)
+
+
+def create_fallback_criteria(results, rubric, result_type):
+    """Create fallback criteria structure if agents didn't return proper format"""
+    criteria = []
+
+    # If rubric is a list (structured rubric), extract criteria names
+    if isinstance(rubric, list):
+        for criterion in rubric:
+            if isinstance(criterion, dict) and "name" in criterion:
+                criteria.append(
+                    {
+                        "name": criterion["name"],
+                        "grade": 0,
+                        "chosen_level": 1,
+                        "comment": "No proper evaluation provided by the agent",
+                    }
+                )
+    else:
+        # Fallback for unstructured rubric
+        criteria = [
+            {
+                "name": "General Assessment",
+                "grade": results.get(f"{result_type}_score", 0),
+                "chosen_level": 1,
+                "comment": results.get(
+                    f"{result_type}_comment", "No detailed assessment available"
+                ),
+            }
+        ]
+
+    return {
+        "criteria": criteria,
+        f"{result_type}_score": results.get(f"{result_type}_score", 0),
+        f"{result_type}_comment": results.get(f"{result_type}_comment", ""),
+    }
+
+
+def record_crew_usage(crew_output, agent, usage_seen):
+    """
+    Record the tokens of one single-agent crew kickoff. CrewAI keeps counting an
+    agent's tokens across kickoffs and agents are reused per thread, so this
+    records the growth since the agent's previous kickoff. `usage_seen` holds
+    the counts last seen per agent, it lives with the agents it describes.
+    """
+    usage = getattr(crew_output, "token_usage", None)
+    if usage is None:
+        return
+    prompt_tokens = usage.prompt_tokens or 0
+    completion_tokens = usage.completion_tokens or 0
+    seen_prompt, seen_completion = usage_seen.get(id(agent), (0, 0))
+    usage_seen[id(agent)] = (prompt_tokens, completion_tokens)
+    if prompt_tokens < seen_prompt or completion_tokens < seen_completion:
+        # Counts restarted, they cover this kickoff only
+        seen_prompt = seen_completion = 0
+    model = getattr(getattr(agent, "llm", None), "model", None)
+    record_usage(
+        model or os.getenv("OPENAI_MODEL_NAME"),
+        prompt_tokens - seen_prompt,
+        completion_tokens - seen_completion,
+    )
+
+
+# key -> [lock, number of threads holding or waiting for it]
+_task_parse_locks = {}
+_task_parse_locks_guard = threading.Lock()
+
+
+@contextmanager
+def _task_parse_lock(key):
+    """Per-task lock, dropped once no thread holds or waits for it"""
+    with _task_parse_locks_guard:
+        entry = _task_parse_locks.setdefault(key, [threading.Lock(), 0])
+        entry[1] += 1
+    try:
+        with entry[0]:
+            yield
+    finally:
+        with _task_parse_locks_guard:
+            entry[1] -= 1
+            if not entry[1]:
+                del _task_parse_locks[key]
+
 
 class AIGrader:
+    """
+    Long-lived grader, safe to share between threads.
+    CrewAI agents keep execution state while they run, so each thread gets its
+    own set of agents (built once per thread), and every process_tasks call
+    runs its tasks in a crew of its own instead of a shared task list.
+    """
+
     def __init__(self):
-        # Create the task-related agents
-        self.create_agents()
-
-        # Initialize the crew with only task agents for sequential processing
-        self.crew = Crew(
-            agents=[
-                self.task_parser_agent,
-                self.task_requirements_scoring_agent,
-                self.task_scope_scoring_agent,
-            ],
-            tasks=[],  # Tasks will be added dynamically
-            verbose=True,
-            process=Process.sequential,  # Ensures tasks are executed one after the other
-        )
+        self._local = threading.local()
+
+    def agents(self):
+        """The calling thread's agents, created on first use"""
+        agents = getattr(self._local, "agents", None)
+        if agents is None:
+            agents = self._local.agents = self.create_agents()
+        return agents
 
     def create_agents(self):
+        # Plain namespace rather than the thread-local itself, so the set can be
+        # handed to the thread that runs the parallel quality scoring
+        agents = SimpleNamespace(usage_seen={})
+
         # Task Parser Agent (for parsing requirements and deliverables)
-        self.task_parser_agent = Agent(
+        agents.task_parser_agent = Agent(
             role="Document reader and parser",
             goal="Extracting the tasks requirements and deliverables from given task description document task description in the field of journey name",
             backstory=(
@@ -72,7 +194,7 @@ class AIGrader:
         )
 
         # Task Requirements Scoring Agent (for scoring the quality of requirements)
-        self.task_requirements_scoring_agent = Agent(
+        agents.task_requirements_scoring_agent = Agent(
             role="Scoring learners' delivered task quality",
             goal="Scoring task requirement versus a given quality rubric",
             backstory=(
@@ -84,7 +206,7 @@ class AIGrader:
         )
 
         # Task Scope Scoring Agent (for scoring the task scope/deliverables)
-        self.task_scope_scoring_agent = Agent(
+        agents.task_scope_scoring_agent = Agent(
             role="Scoring learners' delivered tasks scope",
             goal="Scoring task scope versus a given scope",
             backstory=(
@@ -94,6 +216,7 @@ class AIGrader:
             # llm="o3-mini",
             max_iter=20,
         )
+        return agents
 
     def process_tasks(
         self,
@@ -102,7 +225,10 @@ class AIGrader:
         scope_rubric,
         requirements_rubric,
         solution,
+        parallel_scoring=None,
     ):
+        if parallel_scoring is None:
+            parallel_scoring = GRADER_PARALLEL_SCORING
         print(f"Processing tasks for {task_description} in the {journey_name} journey")
         print(f"Scope rubric type: {type(scope_rubric)}")
         print(f"Requirements rubric type: {type(requirements_rubric)}")
@@ -120,23 +246,24 @@ class AIGrader:
         )
 
         """
-        Processes a series of tasks sequentially:
-          1. Parsing task requirements and scoring them.
-          2. Parsing task deliverables and scoring the scope.
-        The output of each task is first returned as a JSON string.
-        We then convert each output to a dictionary so that it can be validated by the respective Pydantic models.
+        Processes the grading tasks:
+          1. Parsing task requirements and deliverables (memoized per task, see parse_task).
+          2. Scoring the solution quality against the requirements.
+          3. Scoring the solution scope against the deliverables.
+        The output of each scoring task is first returned as a JSON string.
+        We then convert each output to a dictionary.
+        Returns (scope, quality, used_fallback); used_fallback is True when an
+        output had no criteria and was replaced by fallback criteria.
         """
-        # Task: Parse task requirements with output conforming to RequirementsConfig
-        parsing_requirements_task = Task(
-            description=f"Carefully analyze and extract ALL the specific requirements from this task description: '{task_description}' for the {journey_name} journey. List every single requirement, feature, or functionality that needs to be implemented. Do not miss any details.",
-            expected_output="JSON object such as {'requirements_list': ['item1', 'item2', ...]}",
-            agent=self.task_parser_agent,
-            output_json=RequirementsConfig,
-        )
+        agents = self.agents()
+        parsed_task = self.parse_task(task_description, journey_name)
+        requirements_list_str = json.dumps(parsed_task["requirements_list"])
+        deliverables_list_str = json.dumps(parsed_task["deliverables_list"])
 
         # Task: Score the parsed requirements using a quality rubric; output uses QualityScoringConfig
         scoring_requirements_task = Task(
             description=(
+                f"The requirements extracted from the task description are: {requirements_list_str}. "
                 f"Analyze the task solution '{solution}' against the quality rubric '{requirements_rubric_str}'. "
                 f"IMPORTANT: You MUST return a JSON object with this exact structure: "
                 f"{{"
@@ -161,21 +288,13 @@ class AIGrader:
                 f"Rules: Task '{task_description}' must relate to '{journey_name}' journey, otherwise all grades = 0"
             ),
             expected_output="Valid JSON object with 'criteria' array containing objects with 'name', 'grade', 'chosen_level' (as number), 'comment' fields, plus 'quality_score' and 'quality_comment'",
-            agent=self.task_requirements_scoring_agent,
-            context=[parsing_requirements_task],
-        )
-
-        # Task: Parse task deliverables (scope) with output conforming to ScopeConfig
-        parsing_scope_task = Task(
-            description=f"Carefully analyze and extract ALL the specific deliverables, outputs, and components from this task description: '{task_description}' for the {journey_name} journey. List every file, module, feature, or deliverable that should be produced. Do not miss any details.",
-            expected_output="JSON object with all task deliverables such as {'deliverables_list': ['item1', 'item2', ...]}",
-            agent=self.task_parser_agent,
-            output_json=ScopeConfig,
+            agent=agents.task_requirements_scoring_agent,
         )
 
         # Task: Score the parsed scope using a scope rubric; output uses ScopeScoringConfig
         scoring_scope_task = Task(
             description=(
+                f"The deliverables extracted from the task description are: {deliverables_list_str}. "
                 f"Analyze the task solution '{solution}' against the scope rubric '{scope_rubric_str}'. "
                 f"IMPORTANT: You MUST return a JSON object with this exact structure: "
                 f"{{"
@@ -200,28 +319,27 @@ class AIGrader:
                 f"Rules: Task '{task_description}' must relate to '{journey_name}' journey, otherwise all grades = 0"
             ),
             expected_output="Valid JSON object with 'criteria' array containing objects with 'name', 'grade', 'chosen_level' (as number), 'comment' fields, plus 'scope_score' and 'scope_comment'",
-            agent=self.task_scope_scoring_agent,
-            context=[parsing_scope_task],
+            agent=agents.task_scope_scoring_agent,
         )
 
-        # Add all tasks to the crew's task list
-        self.crew.tasks.extend(
-            [
-                parsing_requirements_task,
-                scoring_requirements_task,
-                parsing_scope_task,
-                scoring_scope_task,
-            ]
-        )
-        # Execute all tasks sequentially
-        self.crew.kickoff()
-        scope = self.crew.tasks[3].output
-        scope = str(scope)
-        scope = json_repair.loads(scope)
+        if parallel_scoring:
+            # Quality and scope scoring are independent, run them side by side
+            self.run_scoring_in_parallel(
+                scoring_requirements_task, scoring_scope_task, agents
+            )
+        else:
+            # One crew per task, one after the other, so each is timed on its own
+            self.kickoff_scoring(scoring_requirements_task, "quality_scoring", agents)
+            self.kickoff_scoring(scoring_scope_task, "scope_scoring", agents)
+
+        with span("json_repair"):
+            scope = scoring_scope_task.output
+            scope = str(scope)
+            scope = json_repair.loads(scope)
 
-        quality = self.crew.tasks[1].output
-        quality = str(quality)
-        quality = json_repair.loads(quality)
+            quality = scoring_requirements_task.output
+            quality = str(quality)
+            quality = json_repair.loads(quality)
 
         # Debug: Print raw outputs
         print("RAW SCOPE OUTPUT:")
@@ -230,52 +348,138 @@ class AIGrader:
         print(quality)
 
         # Ensure we have the criteria structure
+        used_fallback = False
         if "criteria" not in scope or not scope["criteria"]:
-            scope = self.create_fallback_criteria(scope, scope_rubric, "scope")
+            used_fallback = True
+            with span("fallback", result_type="scope"):
+                scope = self.create_fallback_criteria(scope, scope_rubric, "scope")
 
         if "criteria" not in quality or not quality["criteria"]:
-            quality = self.create_fallback_criteria(
-                quality, requirements_rubric, "quality"
-            )
+            used_fallback = True
+            with span("fallback", result_type="quality"):
+                quality = self.create_fallback_criteria(
+                    quality, requirements_rubric, "quality"
+                )
 
         print("FINAL SCOPE RESULTS:")
         print(scope)
         print("FINAL QUALITY RESULTS:")
         print(quality)
 
-        return scope, quality
+        return scope, quality, used_fallback
+
+    def run_scoring_in_parallel(
+        self, scoring_requirements_task, scoring_scope_task, agents
+    ):
+        """Kick off the quality and scope scoring tasks as two concurrent crews"""
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            quality_future = executor.submit(
+                in_context(self.kickoff_scoring),
+                scoring_requirements_task,
+                "quality_scoring",
+                agents,
+            )
+            self.kickoff_scoring(scoring_scope_task, "scope_scoring", agents)
+            quality_future.result()
+
+    def kickoff_scoring(self, task, stage, agents):
+        """Run one scoring task in a crew of its own, `agents` is the set task.agent belongs to"""
+        with span(stage, engine="crew"):
+            crew_output = Crew(
+                agents=[task.agent],
+                tasks=[task],
+                verbose=True,
+                process=Process.sequential,
+            ).kickoff()
+            record_crew_usage(crew_output, task.agent, agents.usage_seen)
+
+    def parse_task(self, task_description, journey_name):
+        """
+        Extract the requirements and deliverables lists from the task description.
+        Memoized per (task_description, journey_name) content hash, and concurrent
+        graders of the same task wait for a single parse instead of repeating it.
+        """
+        with span("task_parse") as record:
+            record["cached"] = True
+            return self._parse_task(task_description, journey_name, record)
+
+    def _parse_task(self, task_description, journey_name, record):
+        key = content_hash(task_description, journey_name)
+        parsed_task = task_parse_cache.get(key)
+        if parsed_task is not None:
+            return parsed_task
+
+        with _task_parse_lock(key):
+            parsed_task = task_parse_cache.get(key)
+            if parsed_task is not None:
+                return parsed_task
+
+            record["cached"] = False
+
+            agents = self.agents()
+            task_parser_agent = agents.task_parser_agent
+
+            # Task: Parse task requirements with output conforming to RequirementsConfig
+            parsing_requirements_task = Task(
+                description=f"Carefully analyze and extract ALL the specific requirements from this task description: '{task_description}' for the {journey_name} journey. List every single requirement, feature, or functionality that needs to be implemented. Do not miss any details.",
+                expected_output="JSON object such as {'requirements_list': ['item1', 'item2', ...]}",
+                agent=task_parser_agent,
+                output_json=RequirementsConfig,
+            )
+
+            # Task: Parse task deliverables (scope) with output conforming to ScopeConfig
+            parsing_scope_task = Task(
+                description=f"Carefully analyze and extract ALL the specific deliverables, outputs, and components from this task description: '{task_description}' for the {journey_name} journey. List every file, module, feature, or deliverable that should be produced. Do not miss any details.",
+                expected_output="JSON object with all task deliverables such as {'deliverables_list': ['item1', 'item2', ...]}",
+                agent=task_parser_agent,
+                output_json=ScopeConfig,
+            )
+
+            crew_output = Crew(
+                agents=[task_parser_agent],
+                tasks=[parsing_requirements_task, parsing_scope_task],
+                verbose=True,
+                process=Process.sequential,
+            ).kickoff()
+            record_crew_usage(crew_output, task_parser_agent, agents.usage_seen)
+
+            requirements = json_repair.loads(str(parsing_requirements_task.output))
+            deliverables = json_repair.loads(str(parsing_scope_task.output))
+            parsed_task = {
+                "requirements_list": (
+                    requirements.get("requirements_list", [])
+                    if isinstance(requirements, dict)
+                    else []
+                ),
+                "deliverables_list": (
+                    deliverables.get("deliverables_list", [])
+                    if isinstance(deliverables, dict)
+                    else []
+                ),
+            }
+            # Don't memoize a parse that came back empty, retry it next time
+            if parsed_task["requirements_list"] or parsed_task["deliverables_list"]:
+                task_parse_cache.set(key, parsed_task)
+
+        return parsed_task
 
     def create_fallback_criteria(self, results, rubric, result_type):
         """Create fallback criteria structure if agents didn't return proper format"""
-        criteria = []
-
-        # If rubric is a list (structured rubric), extract criteria names
-        if isinstance(rubric, list):
-            for criterion in rubric:
-                if isinstance(criterion, dict) and "name" in criterion:
-                    criteria.append(
-                        {
-                            "name": criterion["name"],
-                            "grade": 0,
-                            "chosen_level": 1,
-                            "comment": "No proper evaluation provided by the agent",
-                        }
-                    )
-        else:
-            # Fallback for unstructured rubric
-            criteria = [
-                {
-                    "name": "General Assessment",
-                    "grade": results.get(f"{result_type}_score", 0),
-                    "chosen_level": 1,
-                    "comment": results.get(
-                        f"{result_type}_comment", "No detailed assessment available"
-                    ),
-                }
-            ]
-
-        return {
-            "criteria": criteria,
-            f"{result_type}_score": results.get(f"{result_type}_score", 0),
-            f"{result_type}_comment": results.get(f"{result_type}_comment", ""),
-        }
+        return create_fallback_criteria(results, rubric, result_type)
+
+    def model_settings(self):
+        """Settings that change grading output, part of the grading result cache key"""
+        return {"engine": "crew", "model": os.getenv("OPENAI_MODEL_NAME", "")}
+
+
+_grader = None
+_grader_lock = threading.Lock()
+
+
+def get_grader():
+    """Shared AIGrader instance for the whole app"""
+    global _grader
+    with _grader_lock:
+        if _grader is None:
+            _grader = AIGrader()
+    return _grader
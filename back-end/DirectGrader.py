@@ -0,0 +1,136 @@
+import os
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from dotenv import load_dotenv
+from openai import OpenAI
+
+from AIGrader import create_fallback_criteria
+from helpers.metrics import in_context, record_openai_usage, span
+from pydantics import QualityGradingResult, ScopeGradingResult
+
+load_dotenv()
+
+DIRECT_GRADER_MODEL = os.getenv("DIRECT_GRADER_MODEL", "gpt-4o-mini")
+
+client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+
+
+class DirectGrader:
+    """
+    Grades scope and quality with one structured-output OpenAI call each,
+    instead of the CrewAI agent pipeline. Returns the same
+    (scope, quality, used_fallback) as AIGrader.process_tasks. Stateless, so
+    one instance is shared.
+    """
+
+    def __init__(self, model=DIRECT_GRADER_MODEL):
+        self.model = model
+
+    def process_tasks(
+        self,
+        task_description,
+        journey_name,
+        scope_rubric,
+        requirements_rubric,
+        solution,
+    ):
+        # Both calls are independent, run them side by side
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            quality_future = executor.submit(
+                in_context(self.grade),
+                "quality",
+                QualityGradingResult,
+                task_description,
+                journey_name,
+                requirements_rubric,
+                solution,
+            )
+            scope = self.grade(
+                "scope",
+                ScopeGradingResult,
+                task_description,
+                journey_name,
+                scope_rubric,
+                solution,
+            )
+            quality = quality_future.result()
+
+        used_fallback = False
+        if not scope.get("criteria"):
+            used_fallback = True
+            with span("fallback", result_type="scope"):
+                scope = create_fallback_criteria(scope, scope_rubric, "scope")
+        if not quality.get("criteria"):
+            used_fallback = True
+            with span("fallback", result_type="quality"):
+                quality = create_fallback_criteria(
+                    quality, requirements_rubric, "quality"
+                )
+
+        return scope, quality, used_fallback
+
+    def grade(
+        self,
+        result_type,
+        response_model,
+        task_description,
+        journey_name,
+        rubric,
+        solution,
+    ):
+        """Score the solution against one rubric, returns the validated result as a dict"""
+        rubric_str = (
+            json.dumps(rubric) if isinstance(rubric, (dict, list)) else str(rubric)
+        )
+        prompt = (
+            f"Analyze the task solution against the {result_type} rubric.\n"
+            f"Task description: '{task_description}' for the {journey_name} journey.\n"
+            f"Rubric: {rubric_str}\n"
+            f"For each criterion in the rubric: "
+            f"1. Identify the criterion name exactly as in the rubric "
+            f"2. Determine which level (1, 2, 3, etc.) best matches the solution based on the level descriptions "
+            f"3. Assign a grade within that level's range "
+            f"4. Provide clear justification including the level description that was matched "
+            f"5. Sum all grades for {result_type}_score "
+            f"6. For 'chosen_level' field, use only the level number (1, 2, 3, etc.), not the description "
+            f"Rules: Task '{task_description}' must relate to '{journey_name}' journey, otherwise all grades = 0\n"
+            f"Task solution:\n{solution}"
+        )
+        # API errors propagate so the submission is reported as failed, not graded 0
+        with span(f"{result_type}_scoring", engine="direct"):
+            response = client.beta.chat.completions.parse(
+                model=self.model,
+                messages=[
+                    {
+                        "role": "system",
+                        "content": "You are an experienced software engineer grading learners' delivered tasks.",
+                    },
+                    {"role": "user", "content": prompt},
+                ],
+                response_format=response_model,
+            )
+            record_openai_usage(self.model, response)
+        parsed = response.choices[0].message.parsed
+        if parsed is None:
+            print(f"Direct {result_type} grading refused or returned no result")
+            return {}
+        return parsed.dict()
+
+    def model_settings(self):
+        """Settings that change grading output, part of the grading result cache key"""
+        return {"engine": "direct", "model": self.model}
+
+
+_grader = None
+_grader_lock = threading.Lock()
+
+
+def get_direct_grader():
+    """Shared DirectGrader instance for the whole app"""
+    global _grader
+    with _grader_lock:
+        if _grader is None:
+            _grader = DirectGrader()
+    return _grader
@@ -0,0 +1,260 @@
+"""
+Offline throughput benchmark of the grading path. Starts a fake LLM server and a
+fixture file server, points the OpenAI clients at the fake, then runs cohorts of
+users through the chosen target and reports submissions/sec, p50/p95 latency
+(from cohort start to each result) and peak RSS of the process and its workers.
+
+    cd back-end && python -m benchmarks.bench_grading --target evaluate \\
+        --cohorts 1 10 50 100 500 --latency 0.5 --token-rate 80
+
+Targets:
+    evaluate  grade_users, the /evaluate bulk path (download, parse, grade)
+    parse     download_and_parse_file per submission
+    rubric    RubricGenerationAgent.run per task
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import resource
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.fake_llm import FakeLLMServer, sample_rubric
+from benchmarks.file_server import FixtureServer
+
+TASK_DESCRIPTION = (
+    "Build a small inventory web app: list, add and delete products, persist them "
+    "in a database, and document how to run it in a README."
+)
+
+
+def process_tree_rss() -> int:
+    """Resident bytes of this process and its children (the parse pool), Linux only"""
+    page_size = os.sysconf("SC_PAGE_SIZE")
+    pid = os.getpid()
+    total = 0
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                # Fields after the parenthesised command name: state, ppid, ...
+                ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+            if int(entry) != pid and ppid != pid:
+                continue
+            with open(f"/proc/{entry}/statm") as f:
+                total += int(f.read().split()[1]) * page_size
+        except (OSError, IndexError, ValueError):
+            continue
+    return total
+
+
+class PeakRSS:
+    """Samples the process tree's RSS in the background and keeps the peak"""
+
+    def __init__(self, interval=0.05):
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def sample(self):
+        if os.path.isdir("/proc"):
+            return process_tree_rss()
+        # ru_maxrss is the lifetime peak in KB (bytes on macOS)
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+    def __enter__(self):
+        self.peak = self.sample()
+
+        def run():
+            while not self._stop.wait(self.interval):
+                self.peak = max(self.peak, self.sample())
+
+        self._thread = threading.Thread(target=run, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, self.sample())
+
+
+def configure_environment(llm_url, keep_caches):
+    """Must run before the back-end modules are imported, they read it at import"""
+    os.environ["OPENAI_API_KEY"] = "sk-benchmark"
+    os.environ["OPENAI_BASE_URL"] = llm_url
+    os.environ["OPENAI_API_BASE"] = llm_url
+    os.environ.setdefault("OPENAI_MODEL_NAME", "gpt-4o-mini")
+    for key in ("LANGFUSE_PUBLIC_KEY", "LANGFUSE_SECRET_KEY"):
+        os.environ.pop(key, None)
+    if not keep_caches:
+        # Every submission is downloaded, parsed and graded for real
+        os.environ["GRADING_RESULT_CACHE_DB"] = ""
+        os.environ["DOCUMENT_CACHE_DIR"] = ""
+
+
+def submission_urls(files, count, formats, size):
+    return [files.url(index, formats[index % len(formats)], size) for index in range(count)]
+
+
+def grader_input(urls, engine, max_concurrency):
+    from pydantics import GraderInput
+
+    rubric = sample_rubric()
+    return GraderInput(
+        task_description=TASK_DESCRIPTION,
+        journey_name="Web Development",
+        scope_rubric=json.dumps(rubric["Scope"]),
+        requirements_rubric=json.dumps(rubric["Quality"]),
+        users=[
+            {
+                "id": index,
+                "fullName": f"Learner {index}",
+                "email": f"learner{index}@example.com",
+                "profilePicture": None,
+                "status": "submitted",
+                "submissions": url,
+                "submissionId": index,
+            }
+            for index, url in enumerate(urls)
+        ],
+        max_concurrency=max_concurrency,
+        engine=engine,
+        force_regrade=True,
+    )
+
+
+def run_evaluate(urls, args):
+    from helpers.bulk_grader import STATUS_GRADED, iter_grade_users, parse_rubrics
+
+    grading_input = grader_input(urls, args.engine, args.concurrency)
+    scope_rubric, requirements_rubric = parse_rubrics(grading_input)
+
+    async def cohort():
+        start = time.perf_counter()
+        latencies, errors = [], 0
+        async for result in iter_grade_users(
+            grading_input,
+            scope_rubric,
+            requirements_rubric,
+            max_concurrency=grading_input.max_concurrency,
+        ):
+            latencies.append(time.perf_counter() - start)
+            errors += result.get("status") != STATUS_GRADED
+        return latencies, errors
+
+    return asyncio.run(cohort())
+
+
+def run_in_threads(func, items, concurrency):
+    start = time.perf_counter()
+
+    def timed(item):
+        try:
+            func(item)
+            return time.perf_counter() - start, False
+        except Exception as e:
+            print(f"  error: {e}")
+            return time.perf_counter() - start, True
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(timed, items))
+    return [latency for latency, _ in results], sum(error for _, error in results)
+
+
+def run_parse(urls, args):
+    from helpers.downloader import download_and_parse_file
+
+    return run_in_threads(download_and_parse_file, urls, args.concurrency)
+
+
+def run_rubric(urls, args):
+    from generate_rubric_agent_2 import RubricGenerationAgent
+
+    agent = RubricGenerationAgent()
+    tasks = [f"{TASK_DESCRIPTION} (task {index})" for index in range(len(urls))]
+    return run_in_threads(lambda task: agent.run([task]), tasks, args.concurrency)
+
+
+TARGETS = {
+    "evaluate": run_evaluate,
+    "parse": run_parse,
+    "rubric": run_rubric,
+}
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--target", choices=list(TARGETS), default="evaluate")
+    parser.add_argument("--cohorts", type=int, nargs="+", default=[1, 10, 50, 100, 500])
+    parser.add_argument("--formats", nargs="+", default=["pdf", "docx", "xlsx", "pptx"])
+    parser.add_argument("--size", type=int, default=10, help="fixture size, ~pages")
+    parser.add_argument("--engine", choices=["crew", "direct"], default="crew")
+    parser.add_argument("--concurrency", type=int, default=8, help="in-flight submissions")
+    parser.add_argument("--latency", type=float, default=0.5, help="fake LLM s per call")
+    parser.add_argument("--token-rate", type=float, default=80.0, help="fake LLM tokens/s")
+    parser.add_argument(
+        "--keep-caches", action="store_true", help="leave result/document caches on"
+    )
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+
+    llm = FakeLLMServer(latency=args.latency, token_rate=args.token_rate).start()
+    files = FixtureServer().start()
+    configure_environment(llm.base_url, args.keep_caches)
+    run = TARGETS[args.target]
+
+    print(
+        f"target={args.target} engine={args.engine} concurrency={args.concurrency} "
+        f"llm latency={args.latency}s rate={args.token_rate} tok/s size={args.size}"
+    )
+    print(
+        f"{'users':>6} {'wall s':>8} {'subs/s':>8} {'p50 s':>8} {'p95 s':>8} "
+        f"{'peak MB':>8} {'llm calls':>9} {'errors':>7}"
+    )
+    rows = []
+    for users in args.cohorts:
+        urls = submission_urls(files, users, args.formats, args.size)
+        llm_before = llm.requests
+        with PeakRSS() as rss:
+            start = time.perf_counter()
+            latencies, errors = run(urls, args)
+            wall = time.perf_counter() - start
+        row = {
+            "users": users,
+            "wall": wall,
+            "throughput": users / wall,
+            "p50": statistics.median(latencies) if latencies else 0.0,
+            "p95": percentile(latencies, 0.95) if latencies else 0.0,
+            "peak_rss_mb": rss.peak / 2**20,
+            "llm_calls": llm.requests - llm_before,
+            "errors": errors,
+        }
+        rows.append(row)
+        print(
+            f"{row['users']:>6} {row['wall']:>8.2f} {row['throughput']:>8.2f} "
+            f"{row['p50']:>8.2f} {row['p95']:>8.2f} {row['peak_rss_mb']:>8.0f} "
+            f"{row['llm_calls']:>9} {row['errors']:>7}"
+        )
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"args": vars(args), "results": rows}, f, indent=2)
+
+    llm.stop()
+    files.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+Compare the previous whole-file document parsers with the streaming ones.
+Reports wall time and peak traced memory per format and document size.
+
+    cd back-end && python -m benchmarks.bench_parsers [--sizes 10 100 500]
+"""
+
+import argparse
+import time
+import tracemalloc
+from io import BytesIO
+
+from docx import Document
+from openpyxl import load_workbook
+from pptx import Presentation
+from PyPDF2 import PdfReader
+
+from benchmarks.fixtures import generate_fixture
+from helpers.parsers import parse_docx, parse_pdf, parse_pptx, parse_xlsx
+
+
+# Parsers as they were before streaming, kept here as the baseline
+def legacy_parse_pdf(file_bytes):
+    pdf = PdfReader(BytesIO(file_bytes))
+    text = ""
+    for page in pdf.pages:
+        text += page.extract_text() or ""
+    return text.strip()
+
+
+def legacy_parse_xlsx(file_bytes):
+    workbook = load_workbook(filename=BytesIO(file_bytes), data_only=True)
+    results = []
+    for sheet in workbook.worksheets:
+        for row in sheet.iter_rows(values_only=True):
+            results.append(
+                "\t".join([str(cell) if cell is not None else "" for cell in row])
+            )
+    return results
+
+
+def legacy_parse_docx(file_bytes):
+    document = Document(BytesIO(file_bytes))
+    return "\n".join([para.text for para in document.paragraphs if para.text.strip()])
+
+
+def legacy_parse_pptx(file_bytes):
+    presentation = Presentation(BytesIO(file_bytes))
+    slides_text = []
+    for slide in presentation.slides:
+        slide_text = []
+        for shape in slide.shapes:
+            if hasattr(shape, "text"):
+                slide_text.append(shape.text)
+        slides_text.append("\n".join(slide_text))
+    return "\n\n".join(slides_text)
+
+
+PARSERS = {
+    "pdf": (legacy_parse_pdf, parse_pdf),
+    "docx": (legacy_parse_docx, parse_docx),
+    "xlsx": (legacy_parse_xlsx, parse_xlsx),
+    "pptx": (legacy_parse_pptx, parse_pptx),
+}
+
+
+def measure(parser, file_bytes):
+    tracemalloc.start()
+    start = time.perf_counter()
+    parser(file_bytes)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 500])
+    parser.add_argument("--formats", nargs="+", default=list(PARSERS))
+    args = parser.parse_args()
+
+    print(
+        f"{'format':<6} {'size':>6} {'file KB':>9} "
+        f"{'before s':>9} {'after s':>9} {'before MB':>10} {'after MB':>10}"
+    )
+    for ext in args.formats:
+        legacy, streaming = PARSERS[ext]
+        for size in args.sizes:
+            file_bytes = generate_fixture(ext, size)
+            before_time, before_peak = measure(legacy, file_bytes)
+            after_time, after_peak = measure(streaming, file_bytes)
+            print(
+                f"{ext:<6} {size:>6} {len(file_bytes) / 1024:>9.0f} "
+                f"{before_time:>9.3f} {after_time:>9.3f} "
+                f"{before_peak / 2**20:>10.1f} {after_peak / 2**20:>10.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
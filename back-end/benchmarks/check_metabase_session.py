@@ -0,0 +1,61 @@
+"""
+Check that the Metabase client reuses its session: N concurrent queries log in
+once, and after the sessions are revoked the next N log in exactly once more.
+Exits non-zero when a count is off.
+
+    cd back-end && python -m benchmarks.check_metabase_session [--queries 50]
+"""
+
+import argparse
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.fake_metabase import FakeMetabaseServer
+from helpers.metabase import MetabaseClient
+
+
+def run_queries(client, count, concurrency):
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        # Distinct queries that skip the result cache, every one hits the server
+        list(
+            executor.map(
+                lambda index: client.query(f"SELECT {index}", use_cache=False),
+                range(count),
+            )
+        )
+
+
+def check(label, expected, actual):
+    ok = expected == actual
+    print(f"{'ok  ' if ok else 'FAIL'} {label}: expected {expected}, got {actual}")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--latency", type=float, default=0.01)
+    args = parser.parse_args()
+
+    server = FakeMetabaseServer(latency=args.latency).start()
+    client = MetabaseClient(url=server.base_url, username="bench", password="bench")
+    try:
+        results = []
+        run_queries(client, args.queries, args.concurrency)
+        results.append(check(f"logins for {args.queries} queries", 1, server.logins))
+        results.append(check("queries answered", args.queries, server.queries))
+
+        server.revoke_sessions()
+        run_queries(client, args.queries, args.concurrency)
+        results.append(check("logins after a 401", 2, server.logins))
+        results.append(check("queries answered", 2 * args.queries, server.queries))
+        results.append(check("client logins", server.logins, client.logins))
+    finally:
+        server.stop()
+
+    sys.exit(0 if all(results) else 1)
+
+
+if __name__ == "__main__":
+    main()
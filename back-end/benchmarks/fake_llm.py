@@ -0,0 +1,190 @@
+"""
+Deterministic stand-in for the OpenAI chat completions API, so the grading path
+can be benchmarked offline. Answers are shaped after the prompt (rubrics, task
+parsing, quality/scope grades, summaries) and each response takes
+`latency + completion_tokens / token_rate` seconds.
+
+    cd back-end && python -m benchmarks.fake_llm --port 8100 --latency 0.5 --token-rate 80
+    OPENAI_BASE_URL=http://127.0.0.1:8100/v1 OPENAI_API_BASE=http://127.0.0.1:8100/v1 ...
+"""
+
+import argparse
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def estimate_tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+
+def criterion_names(prompt: str):
+    names = re.findall(r'"name": "([^"]+)"', prompt)
+    return list(dict.fromkeys(names))[:10] or ["Criterion 1"]
+
+
+def graded_result(prompt: str, result_type: str) -> dict:
+    names = criterion_names(prompt)
+    criteria = [
+        {
+            "name": name,
+            "grade": 10,
+            "chosen_level": 2,
+            "comment": f"Level 2 matched for {name}.",
+        }
+        for name in names
+    ]
+    return {
+        "criteria": criteria,
+        f"{result_type}_score": 10 * len(criteria),
+        f"{result_type}_comment": f"Benchmark {result_type} assessment.",
+    }
+
+
+def sample_rubric() -> dict:
+    def section(prefix, weights):
+        return [
+            {
+                "name": f"{prefix} criterion {index + 1}",
+                "weight": weight,
+                "levels": [
+                    {"description": "Missing", "range": [0, 0]},
+                    {"description": "Partial", "range": [1, weight // 2]},
+                    {"description": "Complete", "range": [weight // 2 + 1, weight]},
+                ],
+            }
+            for index, weight in enumerate(weights)
+        ]
+
+    return {
+        "Scope": section("Scope", [40, 30, 30]),
+        "Quality": section("Quality", [50, 25, 25]),
+    }
+
+
+def answer(prompt: str) -> str:
+    """Completion text for the prompt, picked from what each caller asks for"""
+    if "scoring rubric" in prompt and '"Scope"' in prompt:
+        return json.dumps(sample_rubric())
+    if "Condense it for a grader" in prompt:
+        return "Condensed submission: deliverables, files and results kept for grading."
+    if "scope_score" in prompt:
+        return json.dumps(graded_result(prompt, "scope"))
+    if "quality_score" in prompt:
+        return json.dumps(graded_result(prompt, "quality"))
+    if "deliverables_list" in prompt:
+        return json.dumps({"deliverables_list": ["Source code", "README", "Report"]})
+    if "requirements_list" in prompt:
+        return json.dumps({"requirements_list": ["Feature A", "Feature B", "Tests"]})
+    return "OK"
+
+
+class FakeLLMServer:
+    """Threaded HTTP server answering POST .../chat/completions"""
+
+    def __init__(self, host="127.0.0.1", port=0, latency=0.5, token_rate=80.0):
+        self.latency = latency
+        self.token_rate = token_rate
+        self.requests = 0
+        self._lock = threading.Lock()
+        self.httpd = ThreadingHTTPServer((host, port), self._handler())
+        self.httpd.daemon_threads = True
+
+    @property
+    def base_url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self):
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def complete(self, body: dict) -> dict:
+        prompt = "\n".join(
+            content if isinstance(content, str) else json.dumps(content)
+            for content in (message.get("content") for message in body.get("messages", []))
+        )
+        content = answer(prompt)
+        # CrewAI agents expect the ReAct final answer format
+        if "Final Answer:" in prompt:
+            content = f"Thought: I now know the final answer\nFinal Answer: {content}"
+
+        prompt_tokens = estimate_tokens(prompt)
+        completion_tokens = estimate_tokens(content)
+        time.sleep(self.latency + completion_tokens / self.token_rate)
+
+        with self._lock:
+            self.requests += 1
+            request_id = self.requests
+        return {
+            "id": f"chatcmpl-bench-{request_id}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "gpt-4o-mini"),
+            "choices": [
+                {
+                    "index": 0,
+                    "message": {"role": "assistant", "content": content},
+                    "finish_reason": "stop",
+                    "logprobs": None,
+                }
+            ],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+            },
+        }
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                body = json.loads(self.rfile.read(length) or b"{}")
+                if not self.path.rstrip("/").endswith("/chat/completions"):
+                    self._send(404, {"error": {"message": f"Unknown path {self.path}"}})
+                    return
+                self._send(200, server.complete(body))
+
+            def _send(self, status, payload):
+                data = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--latency", type=float, default=0.5, help="seconds per call")
+    parser.add_argument("--token-rate", type=float, default=80.0, help="completion tokens/s")
+    args = parser.parse_args()
+
+    server = FakeLLMServer(args.host, args.port, args.latency, args.token_rate)
+    print(f"Fake LLM listening on {server.base_url}")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""
+Stand-in for the Metabase API used by /query. POST /api/session hands out a
+session token, POST /api/dataset/ answers native queries with a small result
+and 401 for unknown or revoked tokens. Counts logins and queries.
+
+    cd back-end && python -m benchmarks.fake_metabase --port 8300
+    METABASE_URL=http://127.0.0.1:8300 ...
+"""
+
+import argparse
+import json
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class FakeMetabaseServer:
+    """Threaded HTTP server keeping its session tokens in memory"""
+
+    def __init__(self, host="127.0.0.1", port=0, latency=0.0):
+        self.latency = latency
+        self.logins = 0
+        self.queries = 0
+        self.rejected = 0
+        self._tokens = set()
+        self._lock = threading.Lock()
+        self.httpd = ThreadingHTTPServer((host, port), self._handler())
+        self.httpd.daemon_threads = True
+
+    @property
+    def base_url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def revoke_sessions(self):
+        """Expire every session, as a Metabase restart or logout would"""
+        with self._lock:
+            self._tokens.clear()
+
+    def login(self):
+        token = str(uuid.uuid4())
+        with self._lock:
+            self.logins += 1
+            self._tokens.add(token)
+        return token
+
+    def accepts(self, token):
+        with self._lock:
+            if token in self._tokens:
+                self.queries += 1
+                return True
+            self.rejected += 1
+            return False
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def send_json(self, status, body):
+                content = json.dumps(body).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(content)))
+                self.end_headers()
+                self.wfile.write(content)
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                body = json.loads(self.rfile.read(length) or b"{}")
+                if server.latency:
+                    time.sleep(server.latency)
+
+                if self.path == "/api/session":
+                    self.send_json(200, {"id": server.login()})
+                elif self.path.rstrip("/") == "/api/dataset":
+                    if not server.accepts(self.headers.get("X-Metabase-Session")):
+                        self.send_json(401, "Unauthenticated")
+                        return
+                    self.send_json(
+                        202,
+                        {
+                            "status": "completed",
+                            "row_count": 1,
+                            "data": {
+                                "cols": [{"name": "query"}],
+                                "rows": [[body.get("native", {}).get("query")]],
+                            },
+                        },
+                    )
+                else:
+                    self.send_json(404, {"error": "Not found"})
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8300)
+    parser.add_argument("--latency", type=float, default=0.0)
+    args = parser.parse_args()
+
+    server = FakeMetabaseServer(args.host, args.port, args.latency)
+    print(f"Serving a fake Metabase API on {server.base_url}")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""
+Local file server for generated submission fixtures, standing in for the
+submission storage. GET /<user>/<size>.<ext> serves a PDF/DOCX/XLSX/PPTX of
+about `size` pages with an ETag, so conditional GETs answer 304.
+
+    cd back-end && python -m benchmarks.file_server --port 8200
+"""
+
+import argparse
+import hashlib
+import re
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from benchmarks.fixtures import GENERATORS, generate_fixture
+
+CONTENT_TYPES = {
+    "pdf": "application/pdf",
+    "docx": "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    "pptx": "application/vnd.openxmlformats-officedocument.presentationml.presentation",
+}
+
+_PATH = re.compile(r"^/[^/]+/(\d+)\.(\w+)$")
+
+
+class FixtureServer:
+    """Threaded HTTP server generating each (format, size) fixture once"""
+
+    def __init__(self, host="127.0.0.1", port=0):
+        self.requests = 0
+        self._fixtures = {}
+        self._lock = threading.Lock()
+        self.httpd = ThreadingHTTPServer((host, port), self._handler())
+        self.httpd.daemon_threads = True
+
+    @property
+    def base_url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def url(self, user, ext, size):
+        return f"{self.base_url}/{user}/{size}.{ext}"
+
+    def start(self):
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def fixture(self, ext, size):
+        """(content, etag) for the fixture, generated on first request"""
+        with self._lock:
+            self.requests += 1
+            if (ext, size) not in self._fixtures:
+                content = generate_fixture(ext, size)
+                etag = '"' + hashlib.sha256(content).hexdigest()[:32] + '"'
+                self._fixtures[(ext, size)] = (content, etag)
+            return self._fixtures[(ext, size)]
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                match = _PATH.match(self.path.split("?")[0])
+                if not match or match.group(2) not in GENERATORS:
+                    self.send_response(404)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+
+                size, ext = int(match.group(1)), match.group(2)
+                content, etag = server.fixture(ext, size)
+                if self.headers.get("If-None-Match") == etag:
+                    self.send_response(304)
+                    self.send_header("ETag", etag)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+
+                self.send_response(200)
+                self.send_header("Content-Type", CONTENT_TYPES[ext])
+                self.send_header("Content-Length", str(len(content)))
+                self.send_header("ETag", etag)
+                self.end_headers()
+                self.wfile.write(content)
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8200)
+    args = parser.parse_args()
+
+    server = FixtureServer(args.host, args.port)
+    print(f"Serving fixtures on {server.base_url}/<user>/<size>.<pdf|docx|xlsx|pptx>")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
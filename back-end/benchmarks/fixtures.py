@@ -0,0 +1,105 @@
+"""Generated PDF/DOCX/XLSX/PPTX submissions of configurable size for benchmarks"""
+
+from io import BytesIO
+
+from docx import Document
+from openpyxl import Workbook
+from pptx import Presentation
+from pptx.util import Inches
+
+LINE = "The learner implemented the requested feature and documented the result {}."
+
+
+def generate_pdf(pages: int, lines_per_page: int = 40) -> bytes:
+    """Minimal multi-page text PDF, written by hand since PyPDF2 can't lay out text"""
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        None,  # Pages, filled in once the page object numbers are known
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    page_refs = []
+    for page in range(pages):
+        lines = [
+            f"({LINE.format(page * lines_per_page + line)}) Tj T*"
+            for line in range(lines_per_page)
+        ]
+        stream = (
+            "BT /F1 9 Tf 11 TL 36 800 Td " + " ".join(lines) + " ET"
+        ).encode("latin-1")
+        objects.append(
+            b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream)
+        )
+        content_ref = len(objects)
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+            b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % content_ref
+        )
+        page_refs.append(len(objects))
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (
+        b" ".join(b"%d 0 R" % ref for ref in page_refs),
+        pages,
+    )
+
+    out = BytesIO()
+    out.write(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(out.tell())
+        out.write(b"%d 0 obj\n%s\nendobj\n" % (number, body))
+    xref = out.tell()
+    out.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1))
+    for offset in offsets:
+        out.write(b"%010d 00000 n \n" % offset)
+    out.write(
+        b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n"
+        % (len(objects) + 1, xref)
+    )
+    return out.getvalue()
+
+
+def generate_docx(paragraphs: int) -> bytes:
+    document = Document()
+    for index in range(paragraphs):
+        document.add_paragraph(LINE.format(index))
+    out = BytesIO()
+    document.save(out)
+    return out.getvalue()
+
+
+def generate_xlsx(rows: int, columns: int = 10, sheets: int = 1) -> bytes:
+    workbook = Workbook(write_only=True)
+    for sheet_index in range(sheets):
+        sheet = workbook.create_sheet(f"Sheet{sheet_index + 1}")
+        for row in range(rows):
+            sheet.append([f"r{row}c{column}" for column in range(columns)])
+    out = BytesIO()
+    workbook.save(out)
+    return out.getvalue()
+
+
+def generate_pptx(slides: int, bullets_per_slide: int = 8) -> bytes:
+    presentation = Presentation()
+    layout = presentation.slide_layouts[6]  # blank
+    for slide_index in range(slides):
+        slide = presentation.slides.add_slide(layout)
+        textbox = slide.shapes.add_textbox(Inches(0.5), Inches(0.5), Inches(9), Inches(6))
+        textbox.text_frame.text = "\n".join(
+            LINE.format(slide_index * bullets_per_slide + bullet)
+            for bullet in range(bullets_per_slide)
+        )
+    out = BytesIO()
+    presentation.save(out)
+    return out.getvalue()
+
+
+GENERATORS = {
+    "pdf": lambda size: generate_pdf(pages=size),
+    "docx": lambda size: generate_docx(paragraphs=size * 40),
+    "xlsx": lambda size: generate_xlsx(rows=size * 40),
+    "pptx": lambda size: generate_pptx(slides=size),
+}
+
+
+def generate_fixture(ext: str, size: int) -> bytes:
+    """A document of the given type; size is roughly the number of pages"""
+    return GENERATORS[ext](size)
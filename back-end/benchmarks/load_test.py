@@ -0,0 +1,67 @@
+"""
+Fire concurrent requests at a running back-end endpoint and report whether they
+overlap or serialize: with a non-blocking endpoint the wall time stays close to
+a single request's latency instead of growing with the concurrency.
+
+    cd back-end && python -m benchmarks.load_test http://localhost:8000/generate_rubric \\
+        --json '{"task_id": "1", "task_description": "..."}' --concurrency 1 10 50
+"""
+
+import argparse
+import json
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+
+def timed_request(session, method, url, payload):
+    start = time.perf_counter()
+    response = session.request(method, url, json=payload, timeout=600)
+    return time.perf_counter() - start, response.status_code
+
+
+def run(method, url, payload, concurrency):
+    session = requests.Session()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        start = time.perf_counter()
+        results = list(
+            executor.map(
+                lambda _: timed_request(session, method, url, payload),
+                range(concurrency),
+            )
+        )
+        wall = time.perf_counter() - start
+    latencies = sorted(latency for latency, _ in results)
+    return {
+        "concurrency": concurrency,
+        "wall": wall,
+        "p50": statistics.median(latencies),
+        "max": latencies[-1],
+        # ~1.0 when requests overlap, ~concurrency when they serialize
+        "serialization": wall / latencies[0],
+        "errors": sum(1 for _, status in results if status >= 400),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("url")
+    parser.add_argument("--method", default="POST")
+    parser.add_argument("--json", default="{}", help="request body")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 10, 50])
+    args = parser.parse_args()
+
+    payload = json.loads(args.json)
+    print(f"{'conc':>5} {'wall s':>8} {'p50 s':>8} {'max s':>8} {'serial x':>9} {'errors':>7}")
+    for concurrency in args.concurrency:
+        stats = run(args.method, args.url, payload, concurrency)
+        print(
+            f"{stats['concurrency']:>5} {stats['wall']:>8.2f} {stats['p50']:>8.2f} "
+            f"{stats['max']:>8.2f} {stats['serialization']:>9.1f} {stats['errors']:>7}"
+        )
+
+
+if __name__ == "__main__":
+    main()
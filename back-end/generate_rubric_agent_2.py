@@ -1,28 +1,99 @@
+import asyncio
 import json
 import re
 import os
+from contextlib import contextmanager
 from dotenv import load_dotenv
 
 
-from openai import OpenAI
+from openai import AsyncOpenAI, OpenAI
+
+from helpers.cache import content_hash
+from helpers.metrics import record_openai_usage, span
+from helpers.rubric_sink import get_rubric_sink
 
 load_dotenv()
 # Ensure the OpenAI API key is set in the environment
-openai = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))  
+openai = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+# Non-blocking client for async endpoints
+async_openai = AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"))
 
 
 class RubricGenerationAgent:
-    def __init__(self, model="o3-mini"):
+    def __init__(self, model="o3-mini", sink=None):
         self.model = model
+        # Where generated rubrics are kept besides the response (RUBRIC_SINK)
+        self.sink = sink or get_rubric_sink()
 
-    def run(self, task_list, output_file="rubric.json"):
+    def run(self, task_list, task_id=None):
         if not task_list or not isinstance(task_list, list):
             print("No valid task provided.")
             return []
 
-        task = task_list[0]
+        self._warn_extra_tasks(task_list)
+        with self._generation_errors():
+            with span("rubric_generation"):
+                response = openai.chat.completions.create(
+                    **self.request_body(task_list[0])
+                )
+                record_openai_usage(self.model, response)
+            return self._finish(response, task_id, task_list[0])
+
+    async def arun(self, task_list, task_id=None):
+        """Same as run, awaiting the OpenAI call instead of blocking the event loop"""
+        if not task_list or not isinstance(task_list, list):
+            print("No valid task provided.")
+            return []
+
+        self._warn_extra_tasks(task_list)
+        with self._generation_errors():
+            with span("rubric_generation"):
+                response = await async_openai.chat.completions.create(
+                    **self.request_body(task_list[0])
+                )
+                record_openai_usage(self.model, response)
+            # The sink may write a file or a database row
+            return await asyncio.to_thread(self._finish, response, task_id, task_list[0])
+
+    def _finish(self, response, task_id, task):
+        """Parse the completion into a rubric and hand it to the sink"""
+        raw_output = response.choices[0].message.content.strip()
+        try:
+            rubric_data = self.parse_rubric(raw_output)
+        except json.JSONDecodeError:
+            print("Raw Output:\n", raw_output)
+            raise
+        self.save_rubric(task_id, task, rubric_data)
+        return rubric_data
+
+    @contextmanager
+    def _generation_errors(self):
+        """Report any failure of run/arun as a ValueError"""
+        try:
+            yield
+        except json.JSONDecodeError as e:
+            print("Rubric JSON Decode Error:", e)
+            raise ValueError(f"Failed to parse rubric JSON: {e}")
+        except Exception as e:
+            print("OpenAI API or General Error:", e)
+            raise ValueError(f"Failed to generate rubric: {e}")
+
+    def request_body(self, task):
+        """Chat completions request for one task (also the body of a Batch API line)"""
+        return {
+            "model": self.model,
+            "messages": [{"role": "user", "content": self._build_prompt(task)}],
+        }
+
+    def _warn_extra_tasks(self, task_list):
+        if len(task_list) > 1:
+            print(
+                f"RubricGenerationAgent.run uses only the first of {len(task_list)} tasks, "
+                "use helpers.rubric_batch.generate_rubrics for several tasks"
+            )
 
-        prompt = """
+    def _build_prompt(self, task):
+        return """
 You are an expert evaluator building a binary-based scoring rubric for an AI grading system.
 
 You will receive a task that includes:
@@ -121,34 +192,66 @@ Here is the task in JSON:
 """ + json.dumps(
             task
         )
-        try:
-            response = openai.chat.completions.create(
-                model=self.model,
-                messages=[{"role": "user", "content": prompt}],
-            )
-
-            raw_output = response.choices[0].message.content.strip()
-            rubric_data = self._clean_model_output(raw_output)
-            rubric_data = json.loads(rubric_data)
-
-            if "Scope" not in rubric_data or "Quality" not in rubric_data:
-                raise ValueError(
-                    "Rubric must contain both 'Scope' and 'Quality' sections."
-                )
 
-            with open(output_file, "w", encoding="utf-8") as f:
-                json.dump(rubric_data, f, indent=2, ensure_ascii=False)
+    def parse_rubric(self, raw_output):
+        rubric_data = self._clean_model_output(raw_output)
+        rubric_data = json.loads(rubric_data)
 
-            return rubric_data
+        if "Scope" not in rubric_data or "Quality" not in rubric_data:
+            raise ValueError("Rubric must contain both 'Scope' and 'Quality' sections.")
+        return rubric_data
 
-        except json.JSONDecodeError as e:
-            print("Rubric JSON Decode Error:", e)
-            print("Raw Output:\n", raw_output)
-            raise ValueError(f"Failed to parse rubric JSON: {e}")
+    def validate_rubric(self, rubric_data):
+        """Problems with the rubric's structure and weights, empty when it is usable"""
+        errors = []
+        for section in ("Scope", "Quality"):
+            criteria = rubric_data.get(section)
+            if not isinstance(criteria, list) or not criteria:
+                errors.append(f"{section}: no criteria")
+                continue
+            total = 0
+            for index, criterion in enumerate(criteria):
+                label = f"{section}[{index}]"
+                if not isinstance(criterion, dict):
+                    errors.append(f"{label}: not an object")
+                    continue
+                if not criterion.get("name"):
+                    errors.append(f"{label}: missing name")
+                weight = criterion.get("weight")
+                if not isinstance(weight, (int, float)) or weight <= 0:
+                    errors.append(f"{label}: weight must be a positive number")
+                    weight = 0
+                total += weight
+                levels = criterion.get("levels")
+                if not isinstance(levels, list) or not levels:
+                    errors.append(f"{label}: no levels")
+                    continue
+                for level in levels:
+                    grade_range = level.get("range") if isinstance(level, dict) else None
+                    if (
+                        not isinstance(grade_range, list)
+                        or len(grade_range) != 2
+                        or not all(isinstance(v, (int, float)) for v in grade_range)
+                        or not 0 <= grade_range[0] <= grade_range[1] <= weight
+                    ):
+                        errors.append(f"{label}: level range must be [min, max] within 0..weight")
+                        break
+            if total != 100:
+                errors.append(f"{section}: weights sum to {total}, expected 100")
+        return errors
 
+    def save_rubric(self, task_id, task, rubric_data):
+        """Hand the rubric to the sink; a failing sink never fails the generation"""
+        if not self.sink.writes:
+            return
+        try:
+            self.sink.save(task_id or content_hash(task)[:16], rubric_data)
         except Exception as e:
-            print("OpenAI API or General Error:", e)
-            raise ValueError(f"Failed to generate rubric: {e}")
+            print(f"Rubric sink error: {e}")
+
+    async def asave_rubric(self, task_id, task, rubric_data):
+        if self.sink.writes:
+            await asyncio.to_thread(self.save_rubric, task_id, task, rubric_data)
 
     def _clean_model_output(self, text):
         text = text.strip()
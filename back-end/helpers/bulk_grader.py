@@ -0,0 +1,347 @@
+import asyncio
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from fastapi import HTTPException
+
+from AIGrader import get_grader
+from DirectGrader import get_direct_grader
+from helpers.downloader import (
+    DOWNLOAD_CONCURRENCY,
+    download_and_parse_file,
+    download_file_async,
+)
+from helpers.metrics import (
+    current_trace,
+    in_context,
+    metrics,
+    span,
+    trace,
+    trace_summary,
+)
+from helpers.result_cache import get_cached_result, result_cache_key, store_result
+from helpers.submission_preprocessor import preprocess_settings, preprocess_submission
+
+# Bulk grading settings
+GRADER_MAX_CONCURRENCY = int(os.getenv("GRADER_MAX_CONCURRENCY", 4))
+GRADER_USER_TIMEOUT = float(os.getenv("GRADER_USER_TIMEOUT", 600))
+# Threads of the grading pool shared by all requests
+GRADER_WORKERS = int(os.getenv("GRADER_WORKERS", GRADER_MAX_CONCURRENCY * 4))
+
+# Long-lived so its threads keep the agents they built (AIGrader.agents)
+# instead of every request rebuilding them in fresh threads
+grading_executor = ThreadPoolExecutor(
+    max_workers=max(1, GRADER_WORKERS), thread_name_prefix="grader"
+)
+
+GRADING_ENGINES = {
+    "crew": get_grader,
+    "direct": get_direct_grader,
+}
+
+STATUS_GRADED = "graded"
+STATUS_FAILED = "failed"
+STATUS_TIMEOUT = "timeout"
+
+
+def format_grading_result(scope, quality, user_id=None):
+    """Shape the raw AIGrader output into the /evaluate response format"""
+    result = {}
+    if user_id is not None:
+        result["user_id"] = user_id
+    result["scope"] = {
+        "criteria": scope["criteria"],
+        "overall_grade": scope["scope_score"],
+        "overall_comment": scope["scope_comment"],
+    }
+    result["quality"] = {
+        "criteria": quality["criteria"],
+        "overall_grade": quality["quality_score"],
+        "overall_comment": quality["quality_comment"],
+    }
+    return result
+
+
+def run_grader(grader_input, solution, scope_rubric, requirements_rubric):
+    """
+    Grade a parsed solution, reusing a stored result for identical inputs.
+    The solution is compacted and fitted into the token budget before grading.
+    Returns (scope, quality, cached, tokens); `force_regrade` skips the cache lookup.
+    """
+    grader = GRADING_ENGINES[grader_input.engine]()
+    key = result_cache_key(
+        solution,
+        scope_rubric,
+        requirements_rubric,
+        grader_input.task_description,
+        grader_input.journey_name,
+        {**grader.model_settings(), **preprocess_settings(grader_input.token_budget)},
+    )
+    if not grader_input.force_regrade:
+        cached = get_cached_result(key)
+        if cached is not None:
+            return cached["scope"], cached["quality"], True, cached.get("tokens")
+
+    with span("preprocess") as record:
+        solution, tokens = preprocess_submission(
+            solution, budget=grader_input.token_budget
+        )
+        record["strategy"] = tokens["strategy"]
+    scope, quality, used_fallback = grader.process_tasks(
+        grader_input.task_description,
+        grader_input.journey_name,
+        scope_rubric,
+        requirements_rubric,
+        solution=solution,
+    )
+    # Fallback criteria mean the grader gave no usable answer, grade again next time
+    if not used_fallback:
+        store_result(key, scope, quality, tokens)
+    return scope, quality, False, tokens
+
+
+def grade_user(grader_input, user, scope_rubric, requirements_rubric, downloaded=None):
+    """Download (unless prefetched), parse and grade a single user's submission (blocking)"""
+    file_content = download_and_parse_file(user.submissions, downloaded)
+    if not file_content:
+        raise ValueError(f"Failed to download submission for user {user.id}")
+
+    scope, quality, cached, tokens = run_grader(
+        grader_input, file_content, scope_rubric, requirements_rubric
+    )
+    result = format_grading_result(scope, quality, user_id=user.id)
+    result["cached"] = cached
+    result["tokens"] = tokens
+    attach_metrics(grader_input, result)
+    return result
+
+
+def attach_metrics(grader_input, result):
+    """Add the current trace's spans, tokens and cost when the input asks for them"""
+    spans = current_trace()
+    if grader_input.include_metrics and spans is not None:
+        result["metrics"] = trace_summary(spans)
+
+
+def failed_result(status, error, user_id=None):
+    """Result entry for a submission that could not be graded"""
+    metrics.inc("grading_submissions_total", status=status)
+    result = {}
+    if user_id is not None:
+        result["user_id"] = user_id
+    result.update({"status": status, "error": error, "scope": None, "quality": None})
+    return result
+
+
+async def _grade_user_isolated(*args):
+    # Spans recorded while grading this user, in this task and its threads
+    with trace():
+        return await _grade_user(*args)
+
+
+async def _grade_user(
+    window,
+    semaphore,
+    download_semaphore,
+    grader_input,
+    user,
+    scope_rubric,
+    requirements_rubric,
+    timeout,
+):
+    # Downloads run ahead of the grading slots so a submission is ready when a
+    # slot frees up, but only a window of them is held in memory at once.
+    # Slots still listed in `slots` on the way out are released here, the
+    # grading takes over the rest once it is submitted.
+    await window.acquire()
+    slots = [window]
+    try:
+        try:
+            downloaded = await download_file_async(user.submissions, download_semaphore)
+        except Exception as e:
+            print(f"Download failed for user {user.id}: {e}")
+            return failed_result(STATUS_FAILED, f"Download/Parsing error: {e}", user.id)
+
+        await semaphore.acquire()
+        slots.append(semaphore)
+        return await _run_grading(
+            slots, grader_input, user, scope_rubric, requirements_rubric, downloaded, timeout
+        )
+    finally:
+        for slot in slots:
+            slot.release()
+
+
+def _release_when_done(loop, future, slots):
+    """
+    Release the slots when the grading thread ends rather than when its caller
+    stops waiting, so timed-out gradings still count against max_concurrency
+    """
+    def release(_):
+        for slot in slots:
+            try:
+                loop.call_soon_threadsafe(slot.release)
+            except RuntimeError:
+                pass  # Event loop already closed
+
+    future.add_done_callback(release)
+
+
+async def _run_grading(
+    slots, grader_input, user, scope_rubric, requirements_rubric, downloaded, timeout
+):
+    loop = asyncio.get_running_loop()
+    started = asyncio.Event()
+    grade = in_context(grade_user)
+
+    def run():
+        loop.call_soon_threadsafe(started.set)
+        return grade(grader_input, user, scope_rubric, requirements_rubric, downloaded)
+
+    future = grading_executor.submit(run)
+    _release_when_done(loop, future, list(slots))
+    slots.clear()
+    try:
+        # The pool is shared with other requests: only time the grading
+        # once a thread has picked it up
+        await started.wait()
+    except asyncio.CancelledError:
+        future.cancel()
+        raise
+    try:
+        result = await asyncio.wait_for(asyncio.wrap_future(future), timeout=timeout)
+    except asyncio.TimeoutError:
+        print(f"Grading timed out for user {user.id} after {timeout}s")
+        return failed_result(
+            STATUS_TIMEOUT, f"Grading timed out after {timeout} seconds", user.id
+        )
+    except Exception as e:
+        # HTTPException from the downloader carries its message in .detail
+        error = getattr(e, "detail", None) or str(e)
+        print(f"Grading failed for user {user.id}: {error}")
+        return failed_result(STATUS_FAILED, error, user.id)
+
+    result["status"] = STATUS_GRADED
+    metrics.inc("grading_submissions_total", status=STATUS_GRADED)
+    return result
+
+
+def _start_gradings(
+    grader_input, scope_rubric, requirements_rubric, max_concurrency, timeout
+):
+    max_concurrency = max(1, max_concurrency or GRADER_MAX_CONCURRENCY)
+    timeout = timeout or GRADER_USER_TIMEOUT
+
+    # Skip users with no submission
+    users = [user for user in grader_input.users if user.submissions]
+    if not users:
+        return []
+
+    semaphore = asyncio.Semaphore(max_concurrency)
+    download_semaphore = asyncio.Semaphore(DOWNLOAD_CONCURRENCY)
+    window = asyncio.Semaphore(max_concurrency + DOWNLOAD_CONCURRENCY)
+    return [
+        asyncio.ensure_future(
+            _grade_user_isolated(
+                window,
+                semaphore,
+                download_semaphore,
+                grader_input,
+                user,
+                scope_rubric,
+                requirements_rubric,
+                timeout,
+            )
+        )
+        for user in users
+    ]
+
+
+async def grade_users(
+    grader_input,
+    scope_rubric,
+    requirements_rubric,
+    max_concurrency=None,
+    timeout=None,
+):
+    """
+    Grade every user with a submission concurrently.
+    At most `max_concurrency` gradings are in flight at once and each one is
+    capped at `timeout` seconds. A failing user is reported with its own status
+    instead of aborting the batch. Results keep the order of `grader_input.users`.
+    """
+    tasks = _start_gradings(
+        grader_input, scope_rubric, requirements_rubric, max_concurrency, timeout
+    )
+    if not tasks:
+        return []
+    return await asyncio.gather(*tasks)
+
+
+async def iter_grade_users(
+    grader_input,
+    scope_rubric,
+    requirements_rubric,
+    max_concurrency=None,
+    timeout=None,
+):
+    """Same as grade_users, but yields each user's result as soon as it is ready"""
+    tasks = _start_gradings(
+        grader_input, scope_rubric, requirements_rubric, max_concurrency, timeout
+    )
+    if not tasks:
+        return
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        # Consumer went away early: drop gradings that have not started yet
+        for task in tasks:
+            task.cancel()
+
+
+def parse_rubrics(grader_input):
+    """Parse the rubrics if they are JSON strings, otherwise use them as strings"""
+    try:
+        scope_rubric = (
+            json.loads(grader_input.scope_rubric)
+            if isinstance(grader_input.scope_rubric, str)
+            else grader_input.scope_rubric
+        )
+        requirements_rubric = (
+            json.loads(grader_input.requirements_rubric)
+            if isinstance(grader_input.requirements_rubric, str)
+            else grader_input.requirements_rubric
+        )
+    except json.JSONDecodeError:
+        scope_rubric = grader_input.scope_rubric
+        requirements_rubric = grader_input.requirements_rubric
+    return scope_rubric, requirements_rubric
+
+
+def grade_solution(grader_input, scope_rubric, requirements_rubric):
+    """Grade a single solution (no user context) from solution or solution_url (blocking)"""
+    with trace():
+        return _grade_solution(grader_input, scope_rubric, requirements_rubric)
+
+
+def _grade_solution(grader_input, scope_rubric, requirements_rubric):
+    solution = grader_input.solution
+    if grader_input.solution_url:
+        solution = download_and_parse_file(grader_input.solution_url)
+        if not solution:
+            raise HTTPException(
+                status_code=400,
+                detail="Failed to download solution from solution_url.",
+            )
+
+    scope, quality, cached, tokens = run_grader(
+        grader_input, solution, scope_rubric, requirements_rubric
+    )
+    result = format_grading_result(scope, quality)
+    result["cached"] = cached
+    result["tokens"] = tokens
+    attach_metrics(grader_input, result)
+    metrics.inc("grading_submissions_total", status=STATUS_GRADED)
+    return result
@@ -0,0 +1,224 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+def content_hash(*parts) -> str:
+    """Stable sha256 over the given parts (dicts/lists are JSON-encoded)"""
+    digest = hashlib.sha256()
+    for part in parts:
+        if not isinstance(part, str):
+            part = json.dumps(part, sort_keys=True, default=str)
+        digest.update(part.encode("utf-8"))
+        # Separator so ("ab", "c") and ("a", "bc") hash differently
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+class LRUCache:
+    """
+    Thread-safe in-memory LRU cache with an optional TTL (seconds). With
+    `max_weight`, entries also carry a weight (e.g. rows) and the least
+    recently used are evicted until the total fits.
+    """
+
+    def __init__(self, maxsize=256, ttl=None, max_weight=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.max_weight = max_weight
+        self.weight = 0
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                value, expires_at, _ = entry
+                if expires_at is None or expires_at > time.monotonic():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                self._pop(key)
+            self.misses += 1
+            return None
+
+    def set(self, key, value, weight=1):
+        now = time.monotonic()
+        expires_at = now + self.ttl if self.ttl else None
+        with self._lock:
+            if self.ttl:
+                # Expired entries would otherwise stay in memory until read
+                for expired in [k for k, entry in self._data.items() if entry[1] <= now]:
+                    self._pop(expired)
+            self._pop(key)
+            self._data[key] = (value, expires_at, weight)
+            self.weight += weight
+            while len(self._data) > self.maxsize or (
+                self.max_weight is not None and self.weight > self.max_weight
+            ):
+                self._pop(next(iter(self._data)))
+
+    def _pop(self, key):
+        entry = self._data.pop(key, None)
+        if entry is not None:
+            self.weight -= entry[2]
+
+    def delete(self, key):
+        with self._lock:
+            self._pop(key)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.weight = 0
+
+    def stats(self):
+        with self._lock:
+            stats = {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+            if self.max_weight is not None:
+                stats["weight"] = self.weight
+                stats["max_weight"] = self.max_weight
+            return stats
+
+
+class SQLiteCache:
+    """
+    Persistent key/value cache in a local SQLite file.
+    Values are stored as JSON, entries expire after `ttl` seconds and the
+    least recently used entries are evicted beyond `max_entries`.
+    """
+
+    def __init__(self, path, table="cache", ttl=None, max_entries=None):
+        self.path = path
+        self.table = table
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute(
+                f"""
+                CREATE TABLE IF NOT EXISTS {table} (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL,
+                    expires_at REAL,
+                    accessed_at REAL NOT NULL
+                )
+                """
+            )
+
+    def get(self, key):
+        now = time.time()
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                f"SELECT value, expires_at FROM {self.table} WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            value, expires_at = row
+            if expires_at is not None and expires_at <= now:
+                self._conn.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+                self.misses += 1
+                return None
+            self._conn.execute(
+                f"UPDATE {self.table} SET accessed_at = ? WHERE key = ?", (now, key)
+            )
+            self.hits += 1
+        return json.loads(value)
+
+    def set(self, key, value):
+        now = time.time()
+        expires_at = now + self.ttl if self.ttl else None
+        with self._lock, self._conn:
+            self._conn.execute(
+                f"INSERT OR REPLACE INTO {self.table} VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value), expires_at, now),
+            )
+            self._evict(now)
+
+    def delete(self, key):
+        with self._lock, self._conn:
+            self._conn.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+
+    def clear(self):
+        with self._lock, self._conn:
+            self._conn.execute(f"DELETE FROM {self.table}")
+
+    def stats(self):
+        with self._lock:
+            (size,) = self._conn.execute(
+                f"SELECT COUNT(*) FROM {self.table}"
+            ).fetchone()
+        return {
+            "size": size,
+            "maxsize": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+    def _evict(self, now):
+        self._conn.execute(
+            f"DELETE FROM {self.table} WHERE expires_at IS NOT NULL AND expires_at <= ?",
+            (now,),
+        )
+        if self.max_entries:
+            self._conn.execute(
+                f"""
+                DELETE FROM {self.table} WHERE key IN (
+                    SELECT key FROM {self.table}
+                    ORDER BY accessed_at DESC LIMIT -1 OFFSET ?
+                )
+                """,
+                (self.max_entries,),
+            )
+
+
+class TieredCache:
+    """In-memory LRU in front of an optional persistent tier"""
+
+    def __init__(self, memory, persistent=None):
+        self.memory = memory
+        self.persistent = persistent
+
+    def get(self, key):
+        value = self.memory.get(key)
+        if value is None and self.persistent is not None:
+            value = self.persistent.get(key)
+            if value is not None:
+                self.memory.set(key, value)
+        return value
+
+    def set(self, key, value):
+        self.memory.set(key, value)
+        if self.persistent is not None:
+            self.persistent.set(key, value)
+
+    def delete(self, key):
+        self.memory.delete(key)
+        if self.persistent is not None:
+            self.persistent.delete(key)
+
+    def clear(self):
+        self.memory.clear()
+        if self.persistent is not None:
+            self.persistent.clear()
+
+    def stats(self):
+        stats = {"memory": self.memory.stats()}
+        if self.persistent is not None:
+            stats["persistent"] = self.persistent.stats()
+        return stats
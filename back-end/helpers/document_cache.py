@@ -0,0 +1,135 @@
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+# Parsed document cache settings, set DOCUMENT_CACHE_DIR to "" to disable
+DOCUMENT_CACHE_DIR = os.getenv("DOCUMENT_CACHE_DIR", os.path.join("temp", "documents"))
+DOCUMENT_CACHE_MAX_BYTES = int(os.getenv("DOCUMENT_CACHE_MAX_BYTES", 512 * 1024 * 1024))
+
+
+class DocumentCache:
+    """
+    On-disk cache of parsed submission text.
+    Texts are stored as files named by a key derived from the content hash, and
+    an SQLite index remembers each URL's ETag/Last-Modified so unchanged files
+    can be revalidated with a conditional GET. Least recently used texts are
+    evicted once the total size exceeds max_bytes.
+    """
+
+    def __init__(self, directory=DOCUMENT_CACHE_DIR, max_bytes=DOCUMENT_CACHE_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        os.makedirs(os.path.join(directory, "parsed"), exist_ok=True)
+        self._conn = sqlite3.connect(
+            os.path.join(directory, "index.sqlite3"), check_same_thread=False
+        )
+        with self._lock, self._conn:
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS urls (
+                    url TEXT PRIMARY KEY,
+                    etag TEXT,
+                    last_modified TEXT,
+                    content_hash TEXT NOT NULL
+                )
+                """
+            )
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS documents (
+                    key TEXT PRIMARY KEY,
+                    size INTEGER NOT NULL,
+                    accessed_at REAL NOT NULL
+                )
+                """
+            )
+
+    def _path(self, key):
+        return os.path.join(self.directory, "parsed", f"{key}.txt")
+
+    def validators(self, url):
+        """Stored {"etag", "last_modified", "content_hash"} for url, or None"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT etag, last_modified, content_hash FROM urls WHERE url = ?",
+                (url,),
+            ).fetchone()
+        if row is None or not (row[0] or row[1]):
+            return None
+        return {"etag": row[0], "last_modified": row[1], "content_hash": row[2]}
+
+    def remember_url(self, url, etag, last_modified, content_hash):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO urls VALUES (?, ?, ?, ?)",
+                (url, etag, last_modified, content_hash),
+            )
+
+    def get_text(self, key):
+        try:
+            with open(self._path(key), "r", encoding="utf-8") as f:
+                text = f.read()
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE documents SET accessed_at = ? WHERE key = ?", (time.time(), key)
+            )
+        self.hits += 1
+        return text
+
+    def put_text(self, key, text):
+        data = text.encode("utf-8")
+        path = self._path(key)
+        # Write to a unique temp name and rename, so readers never see a partial file
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO documents VALUES (?, ?, ?)",
+                (key, len(data), time.time()),
+            )
+            self._evict()
+
+    def _evict(self):
+        (total,) = self._conn.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM documents"
+        ).fetchone()
+        if total <= self.max_bytes:
+            return
+        rows = self._conn.execute(
+            "SELECT key, size FROM documents ORDER BY accessed_at"
+        ).fetchall()
+        for key, size in rows:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(self._path(key))
+            except FileNotFoundError:
+                pass
+            self._conn.execute("DELETE FROM documents WHERE key = ?", (key,))
+            total -= size
+
+    def stats(self):
+        with self._lock:
+            count, total = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM documents"
+            ).fetchone()
+        return {
+            "size": count,
+            "bytes": total,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+document_cache = DocumentCache() if DOCUMENT_CACHE_DIR else None
@@ -1,81 +1,307 @@
+import asyncio
+import hashlib
+import os
+import socket
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from fastapi import HTTPException
-from typing import Union
+from typing import Optional
+
+from helpers.cache import content_hash as cache_key
+from helpers.document_cache import document_cache
+from helpers.metrics import span
+from helpers.parsers import (
+    PARSE_MAX_CHARS,
+    detect_file_type,
+    parse_file_bytes,
+    url_extension,
+)
+
+# Download settings
+DOWNLOAD_CONNECT_TIMEOUT = float(os.getenv("DOWNLOAD_CONNECT_TIMEOUT", 5))
+DOWNLOAD_READ_TIMEOUT = float(os.getenv("DOWNLOAD_READ_TIMEOUT", 30))
+DOWNLOAD_TOTAL_TIMEOUT = float(os.getenv("DOWNLOAD_TOTAL_TIMEOUT", 120))
+DOWNLOAD_MAX_BYTES = int(os.getenv("DOWNLOAD_MAX_BYTES", 50 * 1024 * 1024))
+DOWNLOAD_RETRIES = int(os.getenv("DOWNLOAD_RETRIES", 3))
+DOWNLOAD_POOL_SIZE = int(os.getenv("DOWNLOAD_POOL_SIZE", 20))
+DOWNLOAD_CONCURRENCY = int(os.getenv("DOWNLOAD_CONCURRENCY", 8))
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+
+
+class FileTooLargeError(ValueError):
+    pass
+
+
+def create_session() -> requests.Session:
+    """Keep-alive session with a connection pool and retry/backoff on transient errors"""
+    retry = Retry(
+        total=DOWNLOAD_RETRIES,
+        backoff_factor=0.5,
+        status_forcelist=[429, 500, 502, 503, 504],
+        allowed_methods=["GET", "HEAD"],
+    )
+    adapter = HTTPAdapter(
+        pool_connections=DOWNLOAD_POOL_SIZE,
+        pool_maxsize=DOWNLOAD_POOL_SIZE,
+        max_retries=retry,
+    )
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+# Shared by all downloads so bulk grading reuses TCP/TLS connections
+session = create_session()
+
 
-from PyPDF2 import PdfReader
-from openpyxl import load_workbook
-from io import BytesIO
-from docx import Document
-from pptx import Presentation
+def _response_socket(response):
+    """Socket a streamed response reads from, None if it cannot be found"""
+    sock = getattr(getattr(response.raw, "_connection", None), "sock", None)
+    if sock is None:
+        # "Connection: close" responses own the socket, through their file object
+        fp = getattr(getattr(response.raw, "_fp", None), "fp", None)
+        sock = getattr(getattr(fp, "raw", None), "_sock", None)
+    return sock
 
 
-def download_and_parse_file(url: str) -> Union[str, list[str]]:
+@contextmanager
+def enforce_deadline(response, deadline, timeout):
+    """
+    Abort the transfer at the deadline. The read timeout only bounds the gap
+    between packets, so a server dripping bytes could otherwise hold the read
+    open forever; a timer shuts the socket down to unblock it.
+    """
+    expired = threading.Event()
+
+    def abort():
+        expired.set()
+        sock = _response_socket(response)
+        try:
+            if sock is not None:
+                sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+
+    timer = threading.Timer(max(0.0, deadline - time.monotonic()), abort)
+    timer.daemon = True
+    timer.start()
     try:
-        response = requests.get(url)
+        yield
+    except Exception as e:
+        if expired.is_set():
+            raise TimeoutError(f"Download took longer than {timeout} seconds") from e
+        raise
+    finally:
+        timer.cancel()
+    # A shut down socket can also read as a clean end of the body
+    if expired.is_set():
+        raise TimeoutError(f"Download took longer than {timeout} seconds")
+
+
+@dataclass
+class DownloadedFile:
+    url: str
+    content: bytes
+    content_type: str
+    encoding: Optional[str]
+    content_hash: str
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+    # True when the server answered 304 to a conditional GET; content is then
+    # empty and the parsed text comes from the document cache
+    not_modified: bool = False
+
+
+def download_file(
+    url: str,
+    max_bytes: int = DOWNLOAD_MAX_BYTES,
+    timeout: float = DOWNLOAD_TOTAL_TIMEOUT,
+    conditional: bool = True,
+) -> DownloadedFile:
+    """
+    Stream the file into memory, aborting once it exceeds max_bytes or the timeout.
+    When the document cache knows the URL, revalidate with a conditional GET so an
+    unchanged file is not transferred again.
+    """
+    with span("download") as record:
+        downloaded = _download_file(url, max_bytes, timeout, conditional)
+        record["bytes"] = len(downloaded.content)
+        record["not_modified"] = downloaded.not_modified
+        return downloaded
+
+
+def _download_file(url, max_bytes, timeout, conditional):
+    headers = {}
+    validators = None
+    if conditional and document_cache is not None:
+        validators = document_cache.validators(url)
+        if validators:
+            if validators["etag"]:
+                headers["If-None-Match"] = validators["etag"]
+            if validators["last_modified"]:
+                headers["If-Modified-Since"] = validators["last_modified"]
+
+    deadline = time.monotonic() + timeout
+    with session.get(
+        url,
+        headers=headers,
+        stream=True,
+        timeout=(DOWNLOAD_CONNECT_TIMEOUT, DOWNLOAD_READ_TIMEOUT),
+    ) as response:
+        if response.status_code == 304 and validators:
+            return DownloadedFile(
+                url=url,
+                content=b"",
+                content_type=response.headers.get("Content-Type", ""),
+                encoding=response.encoding,
+                content_hash=validators["content_hash"],
+                etag=validators["etag"],
+                last_modified=validators["last_modified"],
+                not_modified=True,
+            )
         response.raise_for_status()
 
-        file_bytes = response.content
-        file_text = response.text
-        ext = url.lower().split("?")[0].split("#")[0].split(".")[-1]
-
-        if ext in (
-            "py",
-            "js",
-            "txt",
-            "cpp",
-            "c",
-            "java",
-        ):
-            response.encoding = response.apparent_encoding
-            return file_text.strip()
-
-        # === Binary formats ===
-        elif ext == "pdf":
-            return parse_pdf(file_bytes)
-        elif ext == "docx":
-            return parse_docx(file_bytes)
-        elif ext == "xlsx":
-            return parse_xlsx(file_bytes)
-        elif ext == "pptx":
-            return parse_pptx(file_bytes)
-        else:
-            raise ValueError(f"Unsupported or unknown file extension: .{ext}")
+        content_length = response.headers.get("Content-Length")
+        if content_length and content_length.isdigit() and int(content_length) > max_bytes:
+            raise FileTooLargeError(
+                f"File is too large ({content_length} bytes, limit {max_bytes} bytes)"
+            )
 
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Download/Parsing error: {str(e)}")
+        content = bytearray()
+        digest = hashlib.sha256()
+        with enforce_deadline(response, deadline, timeout):
+            for chunk in response.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
+                content.extend(chunk)
+                digest.update(chunk)
+                if len(content) > max_bytes:
+                    raise FileTooLargeError(f"File is too large (limit {max_bytes} bytes)")
+
+        return DownloadedFile(
+            url=url,
+            content=bytes(content),
+            content_type=response.headers.get("Content-Type", ""),
+            encoding=response.encoding,
+            content_hash=digest.hexdigest(),
+            etag=response.headers.get("ETag"),
+            last_modified=response.headers.get("Last-Modified"),
+        )
 
 
-def parse_pdf(file_bytes: bytes) -> str:
-    pdf = PdfReader(BytesIO(file_bytes))
-    text = ""
-    for page in pdf.pages:
-        text += page.extract_text() or ""
-    return text.strip()
+def download_to_file(
+    url: str,
+    output_path: str,
+    max_bytes: int = DOWNLOAD_MAX_BYTES,
+    timeout: float = DOWNLOAD_TOTAL_TIMEOUT,
+) -> dict:
+    """
+    Stream the file to disk chunk by chunk, hashing it on the way. It is written
+    to a temporary name next to output_path and renamed into place once complete,
+    so readers never see a partial file.
+    """
+    directory = os.path.dirname(output_path) or "."
+    os.makedirs(directory, exist_ok=True)
+    deadline = time.monotonic() + timeout
 
+    with session.get(
+        url, stream=True, timeout=(DOWNLOAD_CONNECT_TIMEOUT, DOWNLOAD_READ_TIMEOUT)
+    ) as response:
+        response.raise_for_status()
 
-def parse_xlsx(file_bytes: bytes) -> list[str]:
-    workbook = load_workbook(filename=BytesIO(file_bytes), data_only=True)
-    results = []
-    for sheet in workbook.worksheets:
-        for row in sheet.iter_rows(values_only=True):
-            results.append(
-                "\t".join([str(cell) if cell is not None else "" for cell in row])
+        content_length = response.headers.get("Content-Length")
+        if content_length and content_length.isdigit() and int(content_length) > max_bytes:
+            raise FileTooLargeError(
+                f"File is too large ({content_length} bytes, limit {max_bytes} bytes)"
             )
-    return results  
+
+        size = 0
+        digest = hashlib.sha256()
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".part")
+        try:
+            with os.fdopen(fd, "wb") as f, enforce_deadline(response, deadline, timeout):
+                for chunk in response.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
+                    size += len(chunk)
+                    if size > max_bytes:
+                        raise FileTooLargeError(
+                            f"File is too large (limit {max_bytes} bytes)"
+                        )
+                    f.write(chunk)
+                    digest.update(chunk)
+            os.replace(tmp_path, output_path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+        return {
+            "path": output_path,
+            "size": size,
+            "content_hash": digest.hexdigest(),
+            "content_type": response.headers.get("Content-Type", ""),
+        }
+
+
+async def download_file_async(url: str, semaphore: asyncio.Semaphore = None):
+    """Run download_file in a worker thread, bounded by the given semaphore"""
+    if semaphore is None:
+        return await asyncio.to_thread(download_file, url)
+    async with semaphore:
+        return await asyncio.to_thread(download_file, url)
 
 
-def parse_docx(file_bytes: bytes) -> str:
-    document = Document(BytesIO(file_bytes))
-    return "\n".join([para.text for para in document.paragraphs if para.text.strip()])
+def parse_downloaded_file(downloaded: DownloadedFile) -> str:
+    """Parsed text of the file, served from the document cache when its content is known"""
+    with span("parse") as record:
+        text = _parse_downloaded_file(downloaded)
+        record["chars"] = len(text)
+        return text
 
 
-def parse_pptx(file_bytes: bytes) -> str:
-    presentation = Presentation(BytesIO(file_bytes))
-    slides_text = []
-    for slide in presentation.slides:
-        slide_text = []
-        for shape in slide.shapes:
-            if hasattr(shape, "text"):
-                slide_text.append(shape.text)
-        slides_text.append("\n".join(slide_text))
-    return "\n\n".join(slides_text)
+def _parse_downloaded_file(downloaded):
+    ext = url_extension(downloaded.url)
+    if document_cache is None:
+        return parse_downloaded_bytes(downloaded)
+
+    # Same bytes parsed as another type or with another cutoff give other text
+    key = cache_key(downloaded.content_hash, ext, PARSE_MAX_CHARS)
+    text = document_cache.get_text(key)
+    if text is None:
+        if downloaded.not_modified:
+            # Parsed text was evicted since the 304, fetch the file again
+            downloaded = download_file(downloaded.url, conditional=False)
+            key = cache_key(downloaded.content_hash, ext, PARSE_MAX_CHARS)
+        text = parse_downloaded_bytes(downloaded)
+        document_cache.put_text(key, text)
+
+    if downloaded.etag or downloaded.last_modified:
+        document_cache.remember_url(
+            downloaded.url,
+            downloaded.etag,
+            downloaded.last_modified,
+            downloaded.content_hash,
+        )
+    return text
+
+
+def parse_downloaded_bytes(downloaded: DownloadedFile) -> str:
+    file_type = detect_file_type(
+        downloaded.url, downloaded.content_type, downloaded.content
+    )
+    return parse_file_bytes(file_type, downloaded.content, downloaded.encoding)
+
+
+def download_and_parse_file(url: str, downloaded: DownloadedFile = None) -> str:
+    """Download (unless already prefetched) and parse the file at url"""
+    try:
+        if downloaded is None:
+            downloaded = download_file(url)
+        return parse_downloaded_file(downloaded)
+
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Download/Parsing error: {str(e)}")
@@ -0,0 +1,457 @@
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+from helpers.bulk_grader import (
+    STATUS_FAILED,
+    STATUS_GRADED,
+    failed_result,
+    grade_solution,
+    iter_grade_users,
+    parse_rubrics,
+)
+from pydantics import GraderInput
+
+# Grading job settings
+GRADING_JOBS_BACKEND = os.getenv("GRADING_JOBS_BACKEND", "memory").lower()
+GRADING_JOBS_DB = os.getenv("GRADING_JOBS_DB", "grading_jobs.sqlite3")
+GRADING_JOBS_WORKERS = int(os.getenv("GRADING_JOBS_WORKERS", 2))
+# Finished jobs are dropped after GRADING_JOBS_RETENTION seconds and beyond the
+# newest GRADING_JOBS_MAX, 0 disables either limit
+GRADING_JOBS_RETENTION = float(os.getenv("GRADING_JOBS_RETENTION", 24 * 3600))
+GRADING_JOBS_MAX = int(os.getenv("GRADING_JOBS_MAX", 1000))
+# A runner renews the lease on its jobs every third of GRADING_JOBS_LEASE
+# seconds; unfinished jobs whose lease ran out (their process died) are claimed
+# by another runner
+GRADING_JOBS_LEASE = float(os.getenv("GRADING_JOBS_LEASE", 60))
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_COMPLETED = "completed"
+JOB_FAILED = "failed"
+JOB_FINISHED = (JOB_COMPLETED, JOB_FAILED)
+JOB_UNFINISHED = (JOB_QUEUED, JOB_RUNNING)
+
+
+def count_gradable(grader_input):
+    """Number of results a job for this input will produce"""
+    if grader_input.users:
+        return len([user for user in grader_input.users if user.submissions])
+    return 1
+
+
+class InMemoryJobStore:
+    """
+    Keeps jobs in process memory, jobs are lost on restart. Each worker process
+    has its own jobs, so a job is only visible to the worker that created it.
+    """
+
+    def __init__(self, retention=GRADING_JOBS_RETENTION, max_jobs=GRADING_JOBS_MAX):
+        self.retention = retention
+        self.max_jobs = max_jobs
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def create(self, payload, total, owner=None):
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with self._lock:
+            self._jobs[job_id] = {
+                "job_id": job_id,
+                "status": JOB_QUEUED,
+                "owner": owner,
+                "total": total,
+                "error": None,
+                "created_at": now,
+                "updated_at": now,
+                "payload": payload,
+                "results": [],
+            }
+        return job_id
+
+    def get(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            job = {
+                key: value
+                for key, value in job.items()
+                if key not in ("payload", "owner")
+            }
+            job["results"] = list(job["results"])
+        job["graded"] = len(job["results"])
+        return job
+
+    def get_payload(self, job_id):
+        with self._lock:
+            return self._jobs[job_id]["payload"]
+
+    def set_status(self, job_id, status, error=None):
+        with self._lock:
+            job = self._jobs[job_id]
+            job["status"] = status
+            job["error"] = error
+            job["updated_at"] = time.time()
+            if status in JOB_FINISHED:
+                # Only needed to run or resume the job
+                job["payload"] = None
+                self._prune()
+
+    def _prune(self):
+        """Drop expired finished jobs and the oldest beyond max_jobs (lock held)"""
+        cutoff = time.time() - self.retention if self.retention else None
+        finished = sorted(
+            (job for job in self._jobs.values() if job["status"] in JOB_FINISHED),
+            key=lambda job: job["updated_at"],
+            reverse=True,
+        )
+        for index, job in enumerate(finished):
+            if (self.max_jobs and index >= self.max_jobs) or (
+                cutoff is not None and job["updated_at"] < cutoff
+            ):
+                del self._jobs[job["job_id"]]
+
+    def add_result(self, job_id, result):
+        with self._lock:
+            job = self._jobs[job_id]
+            job["results"].append(result)
+            job["updated_at"] = time.time()
+
+    def claimable(self, lease):
+        """Unfinished jobs without an owner or whose owner's lease ran out"""
+        cutoff = time.time() - lease
+        with self._lock:
+            return [
+                job_id
+                for job_id, job in self._jobs.items()
+                if job["status"] in JOB_UNFINISHED
+                and (job["owner"] is None or job["updated_at"] < cutoff)
+            ]
+
+    def claim(self, job_id, owner, lease):
+        """Take over another runner's claimable job, False when someone holds it"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if (
+                job is None
+                or job["status"] not in JOB_UNFINISHED
+                or job["owner"] == owner
+                or (job["owner"] is not None and job["updated_at"] >= time.time() - lease)
+            ):
+                return False
+            job["owner"] = owner
+            job["updated_at"] = time.time()
+            return True
+
+    def heartbeat(self, owner):
+        """Renew the lease on the owner's unfinished jobs"""
+        now = time.time()
+        with self._lock:
+            for job in self._jobs.values():
+                if job["owner"] == owner and job["status"] in JOB_UNFINISHED:
+                    job["updated_at"] = now
+
+
+class SQLiteJobStore:
+    """
+    Keeps jobs in a local SQLite file so queued and running jobs survive a
+    restart. Worker processes on the same host can share the file: a job is
+    claimed with a single conditional UPDATE, so only one of them runs it.
+    """
+
+    def __init__(
+        self,
+        path=GRADING_JOBS_DB,
+        retention=GRADING_JOBS_RETENTION,
+        max_jobs=GRADING_JOBS_MAX,
+    ):
+        self.retention = retention
+        self.max_jobs = max_jobs
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS grading_jobs (
+                    job_id TEXT PRIMARY KEY,
+                    status TEXT NOT NULL,
+                    total INTEGER NOT NULL,
+                    error TEXT,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL,
+                    payload TEXT NOT NULL,
+                    owner TEXT
+                )
+                """
+            )
+            columns = [row[1] for row in self._conn.execute("PRAGMA table_info(grading_jobs)")]
+            if "owner" not in columns:
+                # Files written before jobs were claimed
+                self._conn.execute("ALTER TABLE grading_jobs ADD COLUMN owner TEXT")
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS grading_job_results (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    job_id TEXT NOT NULL,
+                    result TEXT NOT NULL
+                )
+                """
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_grading_job_results_job_id "
+                "ON grading_job_results (job_id)"
+            )
+
+    def create(self, payload, total, owner=None):
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO grading_jobs "
+                "(job_id, status, total, error, created_at, updated_at, payload, owner) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (job_id, JOB_QUEUED, total, None, now, now, json.dumps(payload), owner),
+            )
+        return job_id
+
+    def get(self, job_id):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT job_id, status, total, error, created_at, updated_at "
+                "FROM grading_jobs WHERE job_id = ?",
+                (job_id,),
+            ).fetchone()
+            if row is None:
+                return None
+            results = self._conn.execute(
+                "SELECT result FROM grading_job_results WHERE job_id = ? ORDER BY id",
+                (job_id,),
+            ).fetchall()
+        return {
+            "job_id": row[0],
+            "status": row[1],
+            "total": row[2],
+            "graded": len(results),
+            "error": row[3],
+            "created_at": row[4],
+            "updated_at": row[5],
+            "results": [json.loads(result[0]) for result in results],
+        }
+
+    def get_payload(self, job_id):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT payload FROM grading_jobs WHERE job_id = ?", (job_id,)
+            ).fetchone()
+        return json.loads(row[0])
+
+    def set_status(self, job_id, status, error=None):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE grading_jobs SET status = ?, error = ?, updated_at = ? "
+                "WHERE job_id = ?",
+                (status, error, time.time(), job_id),
+            )
+            if status in JOB_FINISHED:
+                # Only needed to run or resume the job
+                self._conn.execute(
+                    "UPDATE grading_jobs SET payload = 'null' WHERE job_id = ?",
+                    (job_id,),
+                )
+                self._prune()
+
+    def _prune(self):
+        """Drop expired finished jobs and the oldest beyond max_jobs (lock held)"""
+        expired = set()
+        if self.retention:
+            rows = self._conn.execute(
+                "SELECT job_id FROM grading_jobs WHERE status IN (?, ?) "
+                "AND updated_at < ?",
+                (*JOB_FINISHED, time.time() - self.retention),
+            ).fetchall()
+            expired.update(row[0] for row in rows)
+        if self.max_jobs:
+            rows = self._conn.execute(
+                "SELECT job_id FROM grading_jobs WHERE status IN (?, ?) "
+                "ORDER BY updated_at DESC LIMIT -1 OFFSET ?",
+                (*JOB_FINISHED, self.max_jobs),
+            ).fetchall()
+            expired.update(row[0] for row in rows)
+        if expired:
+            job_ids = [(job_id,) for job_id in expired]
+            self._conn.executemany(
+                "DELETE FROM grading_job_results WHERE job_id = ?", job_ids
+            )
+            self._conn.executemany("DELETE FROM grading_jobs WHERE job_id = ?", job_ids)
+
+    def add_result(self, job_id, result):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO grading_job_results (job_id, result) VALUES (?, ?)",
+                (job_id, json.dumps(result)),
+            )
+            self._conn.execute(
+                "UPDATE grading_jobs SET updated_at = ? WHERE job_id = ?",
+                (time.time(), job_id),
+            )
+
+    def claimable(self, lease):
+        """Unfinished jobs without an owner or whose owner's lease ran out"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT job_id FROM grading_jobs WHERE status IN (?, ?) "
+                "AND (owner IS NULL OR updated_at < ?) ORDER BY created_at",
+                (*JOB_UNFINISHED, time.time() - lease),
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def claim(self, job_id, owner, lease):
+        """Take over another runner's claimable job, False when someone holds it"""
+        now = time.time()
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                "UPDATE grading_jobs SET owner = ?, updated_at = ? "
+                "WHERE job_id = ? AND status IN (?, ?) "
+                "AND (owner IS NULL OR (owner != ? AND updated_at < ?))",
+                (owner, now, job_id, *JOB_UNFINISHED, owner, now - lease),
+            )
+        return cursor.rowcount == 1
+
+    def heartbeat(self, owner):
+        """Renew the lease on the owner's unfinished jobs"""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE grading_jobs SET updated_at = ? "
+                "WHERE owner = ? AND status IN (?, ?)",
+                (time.time(), owner, *JOB_UNFINISHED),
+            )
+
+
+JOB_STORES = {
+    "memory": InMemoryJobStore,
+    "sqlite": SQLiteJobStore,
+}
+
+
+class JobRunner:
+    """
+    Runs grading jobs as background tasks on the event loop. Every job has an
+    owner runner that keeps renewing its lease; jobs of a runner that stopped
+    renewing are claimed and resumed by another one.
+    """
+
+    def __init__(self, store, workers=GRADING_JOBS_WORKERS, lease=GRADING_JOBS_LEASE):
+        self.store = store
+        self.workers = max(1, workers)
+        self.lease = lease
+        self.owner = f"{os.getpid()}-{uuid.uuid4().hex}"
+        self._semaphore = None
+        # Keep references so running jobs are not garbage collected
+        self._tasks = set()
+
+    def submit(self, grader_input: GraderInput):
+        job_id = self.store.create(
+            grader_input.dict(), count_gradable(grader_input), owner=self.owner
+        )
+        self._schedule(job_id)
+        return self.store.get(job_id)
+
+    def resume(self):
+        """Claim and re-schedule jobs left behind by a runner that went away"""
+        job_ids = [
+            job_id
+            for job_id in self.store.claimable(self.lease)
+            if self.store.claim(job_id, self.owner, self.lease)
+        ]
+        for job_id in job_ids:
+            print(f"Resuming grading job {job_id}")
+            self._schedule(job_id)
+        return job_ids
+
+    def start(self):
+        """Resume left over jobs now, then keep renewing leases and claiming stale jobs"""
+        task = asyncio.get_running_loop().create_task(self._watch())
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    async def _watch(self):
+        while True:
+            try:
+                self.store.heartbeat(self.owner)
+                self.resume()
+            except Exception as e:
+                print(f"Grading job lease error: {e}")
+            await asyncio.sleep(self.lease / 3)
+
+    def _schedule(self, job_id):
+        task = asyncio.get_running_loop().create_task(self._run(job_id))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, job_id):
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.workers)
+
+        async with self._semaphore:
+            self.store.set_status(job_id, JOB_RUNNING)
+            try:
+                grader_input = GraderInput(**self.store.get_payload(job_id))
+                scope_rubric, requirements_rubric = parse_rubrics(grader_input)
+
+                if grader_input.users:
+                    # Only grade users that have no result yet (resumed jobs)
+                    done = {
+                        result.get("user_id")
+                        for result in self.store.get(job_id)["results"]
+                    }
+                    grader_input.users = [
+                        user for user in grader_input.users if user.id not in done
+                    ]
+                    async for result in iter_grade_users(
+                        grader_input,
+                        scope_rubric,
+                        requirements_rubric,
+                        max_concurrency=grader_input.max_concurrency,
+                        timeout=grader_input.user_timeout,
+                    ):
+                        self.store.add_result(job_id, result)
+                elif not self.store.get(job_id)["results"]:
+                    try:
+                        result = await asyncio.to_thread(
+                            grade_solution,
+                            grader_input,
+                            scope_rubric,
+                            requirements_rubric,
+                        )
+                        result["status"] = STATUS_GRADED
+                    except Exception as e:
+                        error = getattr(e, "detail", None) or str(e)
+                        result = failed_result(STATUS_FAILED, error)
+                    self.store.add_result(job_id, result)
+
+                self.store.set_status(job_id, JOB_COMPLETED)
+            except Exception as e:
+                print(f"Grading job {job_id} failed: {e}")
+                self.store.set_status(job_id, JOB_FAILED, error=str(e))
+
+
+_job_runner = None
+
+
+def get_job_runner():
+    """Shared job runner for the configured backend (GRADING_JOBS_BACKEND)"""
+    global _job_runner
+    if _job_runner is None:
+        if GRADING_JOBS_BACKEND not in JOB_STORES:
+            raise ValueError(
+                f"Unknown grading jobs backend: {GRADING_JOBS_BACKEND}. "
+                f"Expected one of {', '.join(JOB_STORES)}"
+            )
+        _job_runner = JobRunner(JOB_STORES[GRADING_JOBS_BACKEND]())
+    return _job_runner
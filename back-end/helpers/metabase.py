@@ -0,0 +1,186 @@
+import os
+import re
+import threading
+import time
+
+import requests
+from dotenv import load_dotenv
+from fastapi import HTTPException
+from requests.adapters import HTTPAdapter
+
+from helpers.cache import LRUCache, content_hash
+
+load_dotenv()
+
+# Metabase settings
+METABASE_URL = os.getenv("METABASE_URL", "")
+USERNAME = os.getenv("METABASE_USERNAME", "")
+PASSWORD = os.getenv("METABASE_PASSWORD", "")
+DATABASE_ID = int(os.getenv("METABASE_DATABASE_ID", 2))
+METABASE_CONNECT_TIMEOUT = float(os.getenv("METABASE_CONNECT_TIMEOUT", 5))
+METABASE_TIMEOUT = float(os.getenv("METABASE_TIMEOUT", 60))
+# Metabase sessions last 14 days by default (MAX_SESSION_AGE), log in again a bit earlier
+METABASE_SESSION_TTL = float(os.getenv("METABASE_SESSION_TTL", 13 * 24 * 3600))
+METABASE_POOL_SIZE = int(os.getenv("METABASE_POOL_SIZE", 10))
+# Query results are reused for this many seconds (0 disables the cache)
+QUERY_CACHE_TTL = float(os.getenv("QUERY_CACHE_TTL", 60))
+QUERY_CACHE_SIZE = int(os.getenv("QUERY_CACHE_SIZE", 128))
+# Larger results are not kept in memory
+QUERY_CACHE_MAX_ROWS = int(os.getenv("QUERY_CACHE_MAX_ROWS", 5000))
+# Rows held by all cached results together, least recently used go first
+QUERY_CACHE_MAX_TOTAL_ROWS = int(os.getenv("QUERY_CACHE_MAX_TOTAL_ROWS", 50000))
+
+# Literals and quoted identifiers, comments, and runs of whitespace
+_SQL_TOKENS = re.compile(
+    r"'(?:[^']|'')*'|\"(?:[^\"]|\"\")*\"|(?:\s+|--[^\n]*|/\*.*?\*/)+", re.DOTALL
+)
+
+
+def normalize_sql(sql: str) -> str:
+    """
+    Cache key form of the query: comments and whitespace outside literals
+    collapse to a single space, trailing semicolons are dropped.
+    """
+
+    def replace(match):
+        token = match.group(0)
+        return token if token[0] in "'\"" else " "
+
+    return re.sub(r"[\s;]+$", "", _SQL_TOKENS.sub(replace, sql).strip())
+
+
+class MetabaseClient:
+    """
+    Metabase API client that logs in once and reuses the session token until it
+    expires or Metabase answers 401, over a shared keep-alive connection pool.
+    """
+
+    def __init__(
+        self,
+        url=METABASE_URL,
+        username=USERNAME,
+        password=PASSWORD,
+        database_id=DATABASE_ID,
+        timeout=METABASE_TIMEOUT,
+        session_ttl=METABASE_SESSION_TTL,
+    ):
+        self.url = url.rstrip("/")
+        self.username = username
+        self.password = password
+        self.database_id = database_id
+        self.timeout = (METABASE_CONNECT_TIMEOUT, timeout)
+        self.session_ttl = session_ttl
+        self.logins = 0
+        self._token = None
+        self._token_expires_at = 0
+        self._lock = threading.Lock()
+        self.query_cache = (
+            LRUCache(
+                maxsize=QUERY_CACHE_SIZE,
+                ttl=QUERY_CACHE_TTL,
+                max_weight=QUERY_CACHE_MAX_TOTAL_ROWS,
+            )
+            if QUERY_CACHE_TTL > 0
+            else None
+        )
+
+        adapter = HTTPAdapter(
+            pool_connections=METABASE_POOL_SIZE, pool_maxsize=METABASE_POOL_SIZE
+        )
+        self.http = requests.Session()
+        self.http.mount("http://", adapter)
+        self.http.mount("https://", adapter)
+
+    def session_token(self):
+        token = self._token
+        if token and time.monotonic() < self._token_expires_at:
+            return token
+        with self._lock:
+            # Another request may have logged in while we waited
+            if self._token and time.monotonic() < self._token_expires_at:
+                return self._token
+            self._token = self._login()
+            self._token_expires_at = time.monotonic() + self.session_ttl
+            return self._token
+
+    def invalidate(self, token):
+        """Forget the token after a 401, unless it was already replaced"""
+        with self._lock:
+            if self._token == token:
+                self._token = None
+
+    def _login(self):
+        self.logins += 1
+        response = self.http.post(
+            f"{self.url}/api/session",
+            json={"username": self.username, "password": self.password},
+            timeout=self.timeout,
+        )
+        if response.status_code != 200:
+            raise HTTPException(
+                status_code=response.status_code, detail="Failed to authenticate."
+            )
+        return response.json().get("id")
+
+    def run_native_query(self, sql: str, database_id: int = None):
+        body = {
+            "database": database_id or self.database_id,
+            "type": "native",
+            "native": {"query": sql},
+            "parameters": [],
+        }
+        token = self.session_token()
+        response = self._post_dataset(token, body)
+        if response.status_code == 401:
+            # Session expired or was revoked on the Metabase side: log in once more
+            self.invalidate(token)
+            response = self._post_dataset(self.session_token(), body)
+
+        if response.status_code not in [200, 202]:
+            raise HTTPException(
+                status_code=response.status_code, detail="Query execution failed."
+            )
+        return response.json()
+
+    def query(self, sql: str, database_id: int = None, use_cache: bool = True):
+        """
+        run_native_query through the result cache, keyed by the normalized SQL
+        and database. Returns (result, cached).
+        """
+        database_id = database_id or self.database_id
+        key = content_hash(normalize_sql(sql), database_id)
+        if use_cache and self.query_cache is not None:
+            result = self.query_cache.get(key)
+            if result is not None:
+                return result, True
+
+        result = self.run_native_query(sql, database_id)
+        # Metabase answers 202 with status "failed" on SQL errors, never cache those
+        rows = result.get("data", {}).get("rows") or []
+        if (
+            self.query_cache is not None
+            and result.get("status") != "failed"
+            and len(rows) <= QUERY_CACHE_MAX_ROWS
+        ):
+            # Empty results still take a slot
+            self.query_cache.set(key, result, weight=max(1, len(rows)))
+        return result, False
+
+    def _post_dataset(self, token, body):
+        return self.http.post(
+            f"{self.url}/api/dataset/",
+            headers={"X-Metabase-Session": token},
+            json=body,
+            timeout=self.timeout,
+        )
+
+    def stats(self):
+        return {
+            "logins": self.logins,
+            "has_session": self._token is not None,
+            "queries": self.query_cache.stats() if self.query_cache else None,
+        }
+
+
+# Shared by all /query requests
+metabase = MetabaseClient()
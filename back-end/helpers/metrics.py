@@ -0,0 +1,205 @@
+import contextvars
+import functools
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# USD per 1M (input, output) tokens; MODEL_PRICES='{"model": [in, out]}' adds or overrides
+MODEL_PRICES = {
+    "gpt-4o-mini": (0.15, 0.60),
+    "gpt-4o": (2.50, 10.00),
+    "gpt-4.1-mini": (0.40, 1.60),
+    "gpt-4.1": (2.00, 8.00),
+    "o3-mini": (1.10, 4.40),
+}
+for _model, _prices in json.loads(os.getenv("MODEL_PRICES") or "{}").items():
+    MODEL_PRICES[_model] = tuple(_prices)
+
+STAGE_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+
+def model_price(model):
+    """(input, output) price for the model, also matching dated names like gpt-4o-2024-08-06"""
+    if not model:
+        return None
+    model = model.split("/")[-1]
+    # Longest prefix first so gpt-4o-mini does not match gpt-4o
+    for name in sorted(MODEL_PRICES, key=len, reverse=True):
+        if model == name or model.startswith(f"{name}-"):
+            return MODEL_PRICES[name]
+    return None
+
+
+class Metrics:
+    """Process-wide counters and stage latency histograms in the Prometheus text format"""
+
+    def __init__(self, buckets=STAGE_BUCKETS):
+        self.buckets = buckets
+        self._counters = {}
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    def inc(self, name, value=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name, value, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = [[0] * len(self.buckets), 0.0, 0]
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    histogram[0][index] += 1
+            histogram[1] += value
+            histogram[2] += 1
+
+    def render(self):
+        lines = []
+        with self._lock:
+            counters = sorted(self._counters.items())
+            histograms = sorted(self._histograms.items())
+
+        typed = set()
+        for (name, labels), value in counters:
+            if name not in typed:
+                lines.append(f"# TYPE {name} counter")
+                typed.add(name)
+            lines.append(f"{name}{_labels(labels)} {value}")
+        for (name, labels), (bucket_counts, total, count) in histograms:
+            if name not in typed:
+                lines.append(f"# TYPE {name} histogram")
+                typed.add(name)
+            for bound, bucket_count in zip(self.buckets, bucket_counts):
+                lines.append(f"{name}_bucket{_labels(labels + (('le', bound),))} {bucket_count}")
+            lines.append(f"{name}_bucket{_labels(labels + (('le', '+Inf'),))} {count}")
+            lines.append(f"{name}_sum{_labels(labels)} {total}")
+            lines.append(f"{name}_count{_labels(labels)} {count}")
+        return "\n".join(lines) + "\n"
+
+
+def _labels(labels):
+    if not labels:
+        return ""
+    pairs = []
+    for key, value in labels:
+        value = str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        pairs.append(f'{key}="{value}"')
+    return "{" + ",".join(pairs) + "}"
+
+
+metrics = Metrics()
+
+# Spans of the submission being graded, and the innermost open span
+_trace = contextvars.ContextVar("grading_trace", default=None)
+_current_span = contextvars.ContextVar("grading_span", default=None)
+
+
+@contextmanager
+def trace():
+    """Collect the spans recorded in this context (and threads started with in_context)"""
+    spans = []
+    token = _trace.set(spans)
+    try:
+        yield spans
+    finally:
+        _trace.reset(token)
+
+
+def current_trace():
+    return _trace.get()
+
+
+@contextmanager
+def span(stage, **attributes):
+    """
+    Time a pipeline stage into the grading_stage_seconds histogram and the
+    current trace. LLM usage recorded inside the block is attached to the span.
+    """
+    record = {"stage": stage, **attributes}
+    token = _current_span.set(record)
+    status = "ok"
+    start = time.perf_counter()
+    try:
+        yield record
+    except BaseException:
+        status = "error"
+        raise
+    finally:
+        duration = time.perf_counter() - start
+        _current_span.reset(token)
+        record["status"] = status
+        record["duration_ms"] = round(duration * 1000, 1)
+        metrics.observe("grading_stage_seconds", duration, stage=stage, status=status)
+        spans = _trace.get()
+        if spans is not None:
+            spans.append(record)
+
+
+def record_usage(model, prompt_tokens, completion_tokens):
+    """Count an LLM call's tokens and cost against the current span's stage"""
+    model = model or "unknown"
+    prompt_tokens = prompt_tokens or 0
+    completion_tokens = completion_tokens or 0
+    record = _current_span.get()
+    stage = record["stage"] if record is not None else "other"
+    price = model_price(model)
+    cost = (
+        (prompt_tokens * price[0] + completion_tokens * price[1]) / 1_000_000
+        if price
+        else 0.0
+    )
+
+    metrics.inc("llm_calls_total", stage=stage, model=model)
+    metrics.inc("llm_tokens_total", prompt_tokens, stage=stage, model=model, type="prompt")
+    metrics.inc(
+        "llm_tokens_total", completion_tokens, stage=stage, model=model, type="completion"
+    )
+    metrics.inc("llm_cost_usd_total", cost, stage=stage, model=model)
+
+    if record is not None:
+        record["model"] = model
+        record["prompt_tokens"] = record.get("prompt_tokens", 0) + prompt_tokens
+        record["completion_tokens"] = record.get("completion_tokens", 0) + completion_tokens
+        record["cost_usd"] = round(record.get("cost_usd", 0.0) + cost, 6)
+    return cost
+
+
+def record_openai_usage(model, response):
+    """record_usage from an OpenAI response's usage block"""
+    usage = getattr(response, "usage", None)
+    if usage is not None:
+        record_usage(
+            getattr(response, "model", None) or model,
+            usage.prompt_tokens,
+            usage.completion_tokens,
+        )
+
+
+def trace_summary(spans):
+    """Spans in completion order plus token and cost totals, attached to grading results"""
+    return {
+        "spans": list(spans),
+        "prompt_tokens": sum(record.get("prompt_tokens", 0) for record in spans),
+        "completion_tokens": sum(record.get("completion_tokens", 0) for record in spans),
+        "cost_usd": round(sum(record.get("cost_usd", 0.0) for record in spans), 6),
+    }
+
+
+def in_context(func):
+    """
+    Wrap func to run in a copy of the caller's context, so spans recorded in
+    executor threads land in the caller's trace. Each call gets its own copy,
+    the wrapper can be mapped over a pool.
+    """
+    context = contextvars.copy_context()
+
+    @functools.wraps(func)
+    def run(*args, **kwargs):
+        return context.copy().run(func, *args, **kwargs)
+
+    return run
@@ -0,0 +1,102 @@
+import asyncio
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
+# Parse pool settings, PARSE_POOL_WORKERS=0 parses in the calling thread
+PARSE_POOL_WORKERS = int(os.getenv("PARSE_POOL_WORKERS", os.cpu_count() or 1))
+PARSE_TIMEOUT = float(os.getenv("PARSE_TIMEOUT", 60))
+
+
+def _run_with_cpu_limit(func, cpu_timeout, args):
+    """Runs in the worker: the kernel kills it (SIGXCPU) past cpu_timeout CPU seconds"""
+    if resource is not None and cpu_timeout:
+        usage = resource.getrusage(resource.RUSAGE_SELF)
+        used = int(usage.ru_utime + usage.ru_stime)
+        _, hard = resource.getrlimit(resource.RLIMIT_CPU)
+        soft = used + int(cpu_timeout) + 1
+        if hard != resource.RLIM_INFINITY:
+            soft = min(soft, hard)
+        resource.setrlimit(resource.RLIMIT_CPU, (soft, hard))
+    return func(*args)
+
+
+class ParsePool:
+    """
+    Process pool for CPU-bound document parsing, so extraction runs outside the
+    GIL of the API process. Callers pass bytes in and get text back. A parse that
+    exceeds its timeout has its worker killed and the pool is recreated.
+    Callers wait for a free worker before submitting, so time spent queued
+    does not count against the timeout.
+    """
+
+    def __init__(self, workers=PARSE_POOL_WORKERS, timeout=PARSE_TIMEOUT):
+        self.workers = workers
+        self.timeout = timeout
+        self._executor = None
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(max(1, workers))
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                # spawn: forking a process that runs server threads is unsafe
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+            return self._executor
+
+    def _restart(self, executor):
+        with self._lock:
+            if self._executor is not executor:
+                return  # Already restarted by another caller
+            self._executor = None
+        # Timed-out workers never return on their own, kill them
+        for process in list(getattr(executor, "_processes", {}).values()):
+            process.kill()
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def run(self, func, *args, timeout=None):
+        """Run func(*args) in a worker process (blocking)"""
+        if self.workers <= 0:
+            return func(*args)
+
+        timeout = timeout or self.timeout
+        # A pool broken by another caller's timed-out parse gets one retry
+        for attempt in range(2):
+            with self._slots:
+                executor = self._get_executor()
+                try:
+                    future = executor.submit(_run_with_cpu_limit, func, timeout, args)
+                    return future.result(timeout=timeout)
+                except FutureTimeoutError:
+                    self._restart(executor)
+                    raise TimeoutError(f"Parsing took longer than {timeout} seconds")
+                except BrokenProcessPool:
+                    self._restart(executor)
+                    if attempt:
+                        raise RuntimeError(
+                            "Parser worker crashed (CPU time limit exceeded or out of memory)"
+                        )
+
+    async def run_async(self, func, *args, timeout=None):
+        """Same as run, without blocking the event loop"""
+        return await asyncio.to_thread(self.run, func, *args, timeout=timeout)
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+parse_pool = ParsePool()
@@ -0,0 +1,285 @@
+import json
+import os
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from PyPDF2 import PdfReader
+from openpyxl import load_workbook
+from docx import Document
+from pptx import Presentation
+
+from helpers.parse_pool import parse_pool
+
+# Parsers stop extracting once a document reaches this many characters
+PARSE_MAX_CHARS = int(os.getenv("PARSE_MAX_CHARS", 2_000_000))
+# ZIP submissions: uncompressed bytes read from the archive, and per file
+ZIP_MAX_TOTAL_BYTES = int(os.getenv("ZIP_MAX_TOTAL_BYTES", 50 * 1024 * 1024))
+ZIP_MAX_FILE_BYTES = int(os.getenv("ZIP_MAX_FILE_BYTES", 10 * 1024 * 1024))
+ZIP_PARSE_CONCURRENCY = int(os.getenv("ZIP_PARSE_CONCURRENCY", 4))
+
+# Source and plain-text files, graded as they are
+TEXT_TYPES = {
+    "txt", "md", "rst", "csv", "tsv", "json", "yaml", "yml", "xml", "toml", "ini",
+    "py", "js", "jsx", "ts", "tsx", "java", "c", "h", "cpp", "hpp", "cc", "cs",
+    "go", "rs", "rb", "php", "kt", "swift", "scala", "r", "m", "sql", "sh",
+    "html", "css", "scss", "vue", "dart", "lua", "pl",
+}  # fmt: skip
+
+CONTENT_TYPES = {
+    "application/pdf": "pdf",
+    "application/vnd.openxmlformats-officedocument.wordprocessingml.document": "docx",
+    "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet": "xlsx",
+    "application/vnd.openxmlformats-officedocument.presentationml.presentation": "pptx",
+    "application/zip": "zip",
+    "application/x-zip-compressed": "zip",
+    "application/x-ipynb+json": "ipynb",
+    "text/markdown": "md",
+    "text/x-python": "py",
+    "application/json": "json",
+}
+
+# file type -> (parser, runs in the parse process pool)
+PARSERS = {}
+
+
+def register_parser(*file_types, binary=False):
+    """Register a bytes -> text parser for the given file types"""
+
+    def decorator(func):
+        for file_type in file_types:
+            PARSERS[file_type] = (func, binary)
+        return func
+
+    return decorator
+
+
+def url_extension(url: str) -> str:
+    path = url.lower().split("?")[0].split("#")[0].rsplit("/", 1)[-1]
+    return path.rsplit(".", 1)[-1] if "." in path else ""
+
+
+def sniff_file_type(file_bytes: bytes) -> str:
+    """Detect the file type from its magic bytes, None if unknown"""
+    if file_bytes.startswith(b"%PDF"):
+        return "pdf"
+    if file_bytes.startswith(b"PK\x03\x04"):
+        # Office documents are ZIP archives with a known top-level folder
+        try:
+            with zipfile.ZipFile(BytesIO(file_bytes)) as archive:
+                names = archive.namelist()
+        except zipfile.BadZipFile:
+            return None
+        for prefix, file_type in (("word/", "docx"), ("xl/", "xlsx"), ("ppt/", "pptx")):
+            if any(name.startswith(prefix) for name in names):
+                return file_type
+        return "zip"
+
+    head = file_bytes[:4096]
+    if b"\0" in head:
+        return None
+    stripped = head.lstrip()
+    if stripped.startswith(b"{") and b'"cells"' in file_bytes[:65536]:
+        return "ipynb"
+    return "txt"
+
+
+def detect_file_type(url: str, content_type: str = "", file_bytes: bytes = b"") -> str:
+    """
+    File type from, in order: a known URL extension, the Content-Type header,
+    then the content's magic bytes (signed URLs often have no extension).
+    """
+    ext = url_extension(url)
+    if ext in PARSERS:
+        return ext
+    mime = (content_type or "").split(";")[0].strip().lower()
+    if mime in CONTENT_TYPES:
+        return CONTENT_TYPES[mime]
+    file_type = sniff_file_type(file_bytes) if file_bytes else None
+    if file_type is None:
+        raise ValueError(
+            f"Unsupported or unknown file type: .{ext or '?'} ({mime or 'no content type'})"
+        )
+    return file_type
+
+
+def parse_file_bytes(file_type: str, file_bytes: bytes, encoding: str = None) -> str:
+    """Parse the bytes with the registered parser, binary formats in the process pool"""
+    if file_type not in PARSERS:
+        raise ValueError(f"Unsupported or unknown file type: .{file_type}")
+    parser, binary = PARSERS[file_type]
+    if binary:
+        return parse_pool.run(parse_binary, file_type, file_bytes)
+    return parser(file_bytes, encoding)
+
+
+def parse_binary(file_type: str, file_bytes: bytes) -> str:
+    """Entry point for parse pool workers"""
+    return PARSERS[file_type][0](file_bytes)
+
+
+def collect_text(parts, separator: str = "\n", max_chars: int = None) -> str:
+    """
+    Join text parts yielded by a streaming parser, stopping once max_chars is
+    reached so the rest of the document is never extracted.
+    """
+    max_chars = max_chars or PARSE_MAX_CHARS
+    pieces = []
+    total = 0
+    try:
+        for part in parts:
+            if total + len(part) > max_chars:
+                if max_chars > total:
+                    pieces.append(part[: max_chars - total])
+                pieces.append(f"[... truncated at {max_chars} characters ...]")
+                break
+            pieces.append(part)
+            total += len(part) + len(separator)
+    finally:
+        # Release the parser (e.g. the read-only workbook) right away on early exit
+        if hasattr(parts, "close"):
+            parts.close()
+    return separator.join(pieces).strip()
+
+
+def decode_text(file_bytes: bytes, encoding: str = None) -> str:
+    try:
+        return file_bytes.decode("utf-8")
+    except UnicodeDecodeError:
+        return file_bytes.decode(encoding or "latin-1", errors="replace")
+
+
+@register_parser(*TEXT_TYPES)
+def parse_text(file_bytes: bytes, encoding: str = None) -> str:
+    return decode_text(file_bytes, encoding)[:PARSE_MAX_CHARS].strip()
+
+
+@register_parser("ipynb")
+def parse_ipynb(file_bytes: bytes, encoding: str = None) -> str:
+    notebook = json.loads(decode_text(file_bytes, encoding))
+
+    def iter_cells():
+        for cell in notebook.get("cells", []):
+            source = cell.get("source", "")
+            source = "".join(source) if isinstance(source, list) else source
+            yield f"# [{cell.get('cell_type', 'cell')}]\n{source}"
+            for output in cell.get("outputs", []):
+                text = output.get("text") or output.get("data", {}).get("text/plain")
+                if text:
+                    text = "".join(text) if isinstance(text, list) else text
+                    yield f"# [output]\n{text}"
+
+    return collect_text(iter_cells(), "\n\n")
+
+
+def iter_pdf_pages(file_bytes: bytes):
+    pdf = PdfReader(BytesIO(file_bytes))
+    for page in pdf.pages:
+        yield page.extract_text() or ""
+
+
+def iter_xlsx_rows(file_bytes: bytes):
+    # read_only streams rows from the sheet XML instead of loading every cell
+    workbook = load_workbook(filename=BytesIO(file_bytes), read_only=True, data_only=True)
+    try:
+        for sheet in workbook.worksheets:
+            for row in sheet.iter_rows(values_only=True):
+                yield "\t".join([str(cell) if cell is not None else "" for cell in row])
+    finally:
+        workbook.close()
+
+
+def iter_docx_paragraphs(file_bytes: bytes):
+    document = Document(BytesIO(file_bytes))
+    for para in document.paragraphs:
+        if para.text.strip():
+            yield para.text
+
+
+def iter_pptx_slides(file_bytes: bytes):
+    presentation = Presentation(BytesIO(file_bytes))
+    for slide in presentation.slides:
+        yield "\n".join(shape.text for shape in slide.shapes if hasattr(shape, "text"))
+
+
+@register_parser("pdf", binary=True)
+def parse_pdf(file_bytes: bytes, max_chars: int = None) -> str:
+    return collect_text(iter_pdf_pages(file_bytes), "\n", max_chars)
+
+
+@register_parser("xlsx", binary=True)
+def parse_xlsx(file_bytes: bytes, max_chars: int = None) -> str:
+    return collect_text(iter_xlsx_rows(file_bytes), "\n", max_chars)
+
+
+@register_parser("docx", binary=True)
+def parse_docx(file_bytes: bytes, max_chars: int = None) -> str:
+    return collect_text(iter_docx_paragraphs(file_bytes), "\n", max_chars)
+
+
+@register_parser("pptx", binary=True)
+def parse_pptx(file_bytes: bytes, max_chars: int = None) -> str:
+    return collect_text(iter_pptx_slides(file_bytes), "\n\n", max_chars)
+
+
+def _is_skipped_member(info: zipfile.ZipInfo) -> bool:
+    name = info.filename
+    parts = name.split("/")
+    return (
+        info.is_dir()
+        or name.startswith("__MACOSX/")
+        or any(part.startswith(".") for part in parts)
+        or any(part in ("node_modules", "__pycache__", "venv", ".venv") for part in parts)
+    )
+
+
+def _parse_zip_member(name: str, file_bytes: bytes) -> str:
+    try:
+        file_type = detect_file_type(name, "", file_bytes)
+        if file_type == "zip":
+            return "[nested archive skipped]"
+        return parse_file_bytes(file_type, file_bytes)
+    except Exception as e:
+        return f"[could not parse: {e}]"
+
+
+@register_parser("zip")
+def parse_zip(file_bytes: bytes, encoding: str = None) -> str:
+    """
+    Parse a project archive in one pass: members are read one by one until the
+    uncompressed byte budget is spent, parsed in parallel, and concatenated in
+    archive order with a header per file under the character budget.
+    """
+    members = []
+    total_bytes = 0
+    with zipfile.ZipFile(BytesIO(file_bytes)) as archive:
+        for info in archive.infolist():
+            if _is_skipped_member(info):
+                continue
+            if info.file_size > ZIP_MAX_FILE_BYTES:
+                members.append((info.filename, None, "[skipped: file too large]"))
+                continue
+            if total_bytes + info.file_size > ZIP_MAX_TOTAL_BYTES:
+                members.append((info.filename, None, "[skipped: archive size budget reached]"))
+                break
+            # Never trust the header's size: read at most one byte past the limit
+            with archive.open(info) as member:
+                data = member.read(ZIP_MAX_FILE_BYTES + 1)
+            if len(data) > ZIP_MAX_FILE_BYTES:
+                members.append((info.filename, None, "[skipped: file too large]"))
+                continue
+            total_bytes += len(data)
+            members.append((info.filename, data, None))
+
+    with ThreadPoolExecutor(max_workers=max(1, ZIP_PARSE_CONCURRENCY)) as executor:
+        futures = [
+            executor.submit(_parse_zip_member, name, data) if data is not None else None
+            for name, data, _ in members
+        ]
+
+        def iter_files():
+            for (name, _, note), future in zip(members, futures):
+                text = note if future is None else future.result()
+                yield f"===== {name} =====\n{text}"
+
+        return collect_text(iter_files(), "\n\n")
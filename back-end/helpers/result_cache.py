@@ -0,0 +1,49 @@
+import os
+
+from helpers.cache import SQLiteCache, content_hash
+
+# Grading result cache settings, set GRADING_RESULT_CACHE_DB to "" to disable
+GRADING_RESULT_CACHE_DB = os.getenv(
+    "GRADING_RESULT_CACHE_DB", "grading_results_cache.sqlite3"
+)
+GRADING_RESULT_CACHE_TTL = float(os.getenv("GRADING_RESULT_CACHE_TTL", 7 * 24 * 3600))
+GRADING_RESULT_CACHE_MAX_ENTRIES = int(
+    os.getenv("GRADING_RESULT_CACHE_MAX_ENTRIES", 10000)
+)
+
+result_cache = (
+    SQLiteCache(
+        GRADING_RESULT_CACHE_DB,
+        table="grading_results",
+        ttl=GRADING_RESULT_CACHE_TTL,
+        max_entries=GRADING_RESULT_CACHE_MAX_ENTRIES,
+    )
+    if GRADING_RESULT_CACHE_DB
+    else None
+)
+
+
+def result_cache_key(
+    solution, scope_rubric, requirements_rubric, task_description, journey_name, settings
+):
+    """Content hash of everything that determines a grading result"""
+    return content_hash(
+        solution,
+        scope_rubric,
+        requirements_rubric,
+        task_description,
+        journey_name,
+        settings,
+    )
+
+
+def get_cached_result(key):
+    """Stored {"scope", "quality", "tokens"} entry for this key, or None"""
+    if result_cache is None:
+        return None
+    return result_cache.get(key)
+
+
+def store_result(key, scope, quality, tokens=None):
+    if result_cache is not None:
+        result_cache.set(key, {"scope": scope, "quality": quality, "tokens": tokens})
@@ -0,0 +1,237 @@
+import asyncio
+import json
+import os
+
+from generate_rubric_agent_2 import RubricGenerationAgent, async_openai
+from helpers.metrics import record_openai_usage, span
+
+# Batch rubric generation settings
+RUBRIC_BATCH_CONCURRENCY = int(os.getenv("RUBRIC_BATCH_CONCURRENCY", 4))
+# "local" calls chat completions directly, "openai" submits an OpenAI batch job
+RUBRIC_BATCH_RUNNER = os.getenv("RUBRIC_BATCH_RUNNER", "local").lower()
+RUBRIC_BATCH_ENDPOINT = "/v1/chat/completions"
+
+RUBRIC_GENERATED = "generated"
+RUBRIC_INVALID = "invalid"
+RUBRIC_FAILED = "failed"
+
+
+def build_batch_requests(agent, items):
+    """One OpenAI Batch API input line per {task_id, task_description} item"""
+    return [
+        {
+            "custom_id": item["task_id"],
+            "method": "POST",
+            "url": RUBRIC_BATCH_ENDPOINT,
+            "body": agent.request_body(item["task_description"]),
+        }
+        for item in items
+    ]
+
+
+class LocalBatchRunner:
+    """
+    Runs Batch API input lines against chat completions right away, with bounded
+    concurrency, and yields Batch API output lines as each request finishes.
+    """
+
+    def __init__(self, max_concurrency=RUBRIC_BATCH_CONCURRENCY):
+        self.max_concurrency = max(1, max_concurrency)
+
+    async def run(self, batch_requests):
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def call(batch_request):
+            async with semaphore:
+                try:
+                    with span("rubric_generation"):
+                        response = await async_openai.chat.completions.create(
+                            **batch_request["body"]
+                        )
+                        record_openai_usage(batch_request["body"]["model"], response)
+                    return {
+                        "custom_id": batch_request["custom_id"],
+                        "response": {"status_code": 200, "body": response.model_dump()},
+                        "error": None,
+                    }
+                except Exception as e:
+                    return {
+                        "custom_id": batch_request["custom_id"],
+                        "response": None,
+                        "error": {"code": type(e).__name__, "message": str(e)},
+                    }
+
+        tasks = [asyncio.ensure_future(call(line)) for line in batch_requests]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            # Client went away: stop the calls that have not finished
+            for task in tasks:
+                task.cancel()
+
+
+class OpenAIBatchRunner:
+    """
+    Submits the lines as an OpenAI batch job (half the price, up to 24h latency).
+    The job outlives the request that submitted it: callers keep the batch id
+    and collect the results later with openai_batch_results.
+    """
+
+    async def submit(self, batch_requests, metadata=None):
+        data = "\n".join(json.dumps(line) for line in batch_requests).encode("utf-8")
+        input_file = await async_openai.files.create(
+            file=("rubrics.jsonl", data), purpose="batch"
+        )
+        batch = await async_openai.batches.create(
+            input_file_id=input_file.id,
+            endpoint=RUBRIC_BATCH_ENDPOINT,
+            completion_window="24h",
+            metadata=metadata,
+        )
+        print(f"Submitted rubric batch {batch.id} with {len(batch_requests)} tasks")
+        return batch
+
+    async def retrieve(self, batch_id):
+        return await async_openai.batches.retrieve(batch_id)
+
+    async def task_ids(self, batch):
+        """custom_id of every line the batch was submitted with"""
+        content = await async_openai.files.content(batch.input_file_id)
+        return [
+            json.loads(line)["custom_id"]
+            for line in content.text.splitlines()
+            if line.strip()
+        ]
+
+    async def output_lines(self, batch):
+        # Expired and cancelled batches still return their finished requests
+        for file_id in (batch.output_file_id, batch.error_file_id):
+            if not file_id:
+                continue
+            content = await async_openai.files.content(file_id)
+            for line in content.text.splitlines():
+                if not line.strip():
+                    continue
+                try:
+                    yield json.loads(line)
+                except ValueError as e:
+                    print(f"Skipping unreadable line of rubric batch {batch.id}: {e}")
+
+
+BATCH_RUNNERS = {
+    "local": LocalBatchRunner,
+    "openai": OpenAIBatchRunner,
+}
+BATCH_ENDED = ("completed", "failed", "expired", "cancelled")
+
+
+def read_batch_output(agent, output_line):
+    """Per-task status record for one Batch API output line, never raises"""
+    task_id = output_line.get("custom_id") if isinstance(output_line, dict) else None
+    try:
+        return _read_batch_output(agent, task_id, output_line)
+    except Exception as e:
+        # One malformed line only fails its own task
+        return batch_record(task_id, RUBRIC_FAILED, errors=[f"Unreadable result: {e}"])
+
+
+def _read_batch_output(agent, task_id, output_line):
+    response = output_line.get("response") or {}
+    if output_line.get("error") or response.get("status_code") != 200:
+        error = output_line.get("error") or (response.get("body") or {}).get("error") or {}
+        message = error.get("message") or f"HTTP {response.get('status_code')}"
+        return batch_record(task_id, RUBRIC_FAILED, errors=[message])
+
+    raw_output = response["body"]["choices"][0]["message"]["content"] or ""
+    try:
+        rubric = agent.parse_rubric(raw_output.strip())
+    except ValueError as e:
+        return batch_record(task_id, RUBRIC_FAILED, errors=[f"Invalid rubric JSON: {e}"])
+
+    errors = agent.validate_rubric(rubric)
+    status = RUBRIC_INVALID if errors else RUBRIC_GENERATED
+    return batch_record(task_id, status, rubric, errors)
+
+
+def batch_record(task_id, status, rubric=None, errors=None):
+    return {
+        "task_id": task_id,
+        "status": status,
+        "rubric": rubric,
+        "errors": errors or [],
+    }
+
+
+async def generate_rubrics(items, runner=None, agent=None):
+    """
+    Generate rubrics for many {task_id, task_description} items, yielding a
+    validated status record per task in completion order. Runs the requests
+    right away (LocalBatchRunner); OpenAI batch jobs go through
+    submit_openai_batch and openai_batch_results instead.
+    """
+    agent = agent or RubricGenerationAgent()
+    runner = runner or LocalBatchRunner()
+    descriptions = {item["task_id"]: item["task_description"] for item in items}
+    pending = set(descriptions)
+
+    error = "No result returned for this task"
+    outputs = runner.run(build_batch_requests(agent, items))
+    try:
+        async for output_line in outputs:
+            record = read_batch_output(agent, output_line)
+            if record["task_id"] not in pending:
+                continue
+            pending.discard(record["task_id"])
+            if record["status"] == RUBRIC_GENERATED:
+                await agent.asave_rubric(
+                    record["task_id"], descriptions[record["task_id"]], record["rubric"]
+                )
+            yield record
+    except Exception as e:
+        print(f"Rubric batch error: {e}")
+        error = str(e)
+    finally:
+        await outputs.aclose()
+
+    for task_id in pending:
+        yield batch_record(task_id, RUBRIC_FAILED, errors=[error])
+
+
+async def submit_openai_batch(items, metadata=None, runner=None, agent=None):
+    """Submit an OpenAI batch job for the items, returns the batch"""
+    agent = agent or RubricGenerationAgent()
+    runner = runner or OpenAIBatchRunner()
+    return await runner.submit(build_batch_requests(agent, items), metadata)
+
+
+async def openai_batch_results(batch_id, runner=None, agent=None):
+    """
+    (batch, records) for a submitted batch job. records is None while the job
+    runs; once it has ended there is a validated record per task, and
+    generated rubrics are handed to the agent's sink.
+    """
+    agent = agent or RubricGenerationAgent()
+    runner = runner or OpenAIBatchRunner()
+    batch = await runner.retrieve(batch_id)
+    if batch.status not in BATCH_ENDED:
+        return batch, None
+
+    pending = set(await runner.task_ids(batch))
+    records = []
+    async for output_line in runner.output_lines(batch):
+        record = read_batch_output(agent, output_line)
+        if record["task_id"] not in pending:
+            continue
+        pending.discard(record["task_id"])
+        if record["status"] == RUBRIC_GENERATED:
+            await agent.asave_rubric(record["task_id"], None, record["rubric"])
+        records.append(record)
+
+    error = (
+        f"Rubric batch failed: {batch.errors}"
+        if batch.status == "failed"
+        else f"No result returned for this task (batch {batch.status})"
+    )
+    records.extend(batch_record(task_id, RUBRIC_FAILED, errors=[error]) for task_id in pending)
+    return batch, records
@@ -0,0 +1,84 @@
+import json
+import os
+import re
+import tempfile
+
+from supabase_db import supabase_client, upsert_rubric
+
+# Where generated rubrics are kept besides the response: "none", "file" or "db"
+RUBRIC_SINK = os.getenv("RUBRIC_SINK", "none").lower()
+RUBRIC_SINK_DIR = os.getenv("RUBRIC_SINK_DIR", "temp/rubrics")
+
+
+class NullRubricSink:
+    """Keeps nothing, the request path does no I/O"""
+
+    writes = False
+    persists = False
+
+    def save(self, task_id, rubric):
+        pass
+
+
+class FileRubricSink:
+    """
+    One JSON file per task under a directory. Files are written to a temporary
+    name and renamed into place, so concurrent workers never see a partial file.
+    """
+
+    writes = True
+    persists = False
+
+    def __init__(self, directory=RUBRIC_SINK_DIR):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, task_id):
+        name = re.sub(r"[^A-Za-z0-9_.-]", "_", str(task_id))
+        return os.path.join(self.directory, f"{name}.json")
+
+    def save(self, task_id, rubric):
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(rubric, f, indent=2, ensure_ascii=False)
+            os.replace(tmp_path, self.path(task_id))
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+
+class DatabaseRubricSink:
+    """Upserts the rubric into the assignments table"""
+
+    writes = True
+    # Endpoints skip their own persist step, the sink already saved the rubric
+    persists = True
+
+    def save(self, task_id, rubric):
+        if supabase_client is None:
+            print("Rubric sink: database connection not available, rubric not saved")
+            return
+        upsert_rubric(supabase_client, task_id, rubric)
+
+
+RUBRIC_SINKS = {
+    "none": NullRubricSink,
+    "file": FileRubricSink,
+    "db": DatabaseRubricSink,
+}
+
+_rubric_sink = None
+
+
+def get_rubric_sink():
+    """Shared sink for the configured RUBRIC_SINK"""
+    global _rubric_sink
+    if _rubric_sink is None:
+        if RUBRIC_SINK not in RUBRIC_SINKS:
+            raise ValueError(
+                f"Unknown rubric sink: {RUBRIC_SINK}. "
+                f"Expected one of {', '.join(RUBRIC_SINKS)}"
+            )
+        _rubric_sink = RUBRIC_SINKS[RUBRIC_SINK]()
+    return _rubric_sink
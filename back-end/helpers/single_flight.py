@@ -0,0 +1,33 @@
+import asyncio
+
+
+class SingleFlight:
+    """
+    Coalesce concurrent calls for the same key: the first caller runs the
+    coroutine, later callers await the same in-flight result instead of
+    starting their own.
+    """
+
+    def __init__(self):
+        self._in_flight = {}
+        self.calls = 0
+        self.shared = 0
+
+    async def do(self, key, coroutine_factory):
+        task = self._in_flight.get(key)
+        if task is None:
+            self.calls += 1
+            task = asyncio.ensure_future(coroutine_factory())
+            self._in_flight[key] = task
+            task.add_done_callback(lambda _: self._in_flight.pop(key, None))
+        else:
+            self.shared += 1
+        # shield: a caller that disconnects must not cancel the others' result
+        return await asyncio.shield(task)
+
+    def stats(self):
+        return {
+            "in_flight": len(self._in_flight),
+            "calls": self.calls,
+            "shared": self.shared,
+        }
@@ -0,0 +1,190 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from dotenv import load_dotenv
+from openai import OpenAI
+
+from helpers.metrics import in_context, record_openai_usage
+
+load_dotenv()
+
+# Submission size settings
+SUBMISSION_TOKEN_BUDGET = int(os.getenv("SUBMISSION_TOKEN_BUDGET", 12000))
+SUBMISSION_CHUNK_TOKENS = int(os.getenv("SUBMISSION_CHUNK_TOKENS", 4000))
+# "summarize" condenses chunks with an LLM before grading, "truncate" keeps head and tail
+SUBMISSION_OVERFLOW_STRATEGY = os.getenv("SUBMISSION_OVERFLOW_STRATEGY", "summarize")
+SUBMISSION_SUMMARY_MODEL = os.getenv("SUBMISSION_SUMMARY_MODEL", "gpt-4o-mini")
+SUBMISSION_SUMMARY_CONCURRENCY = int(os.getenv("SUBMISSION_SUMMARY_CONCURRENCY", 4))
+
+# tiktoken is optional, fall back to a ~4 characters per token estimate
+try:
+    import tiktoken
+
+    _encoding = tiktoken.get_encoding("o200k_base")
+except Exception:
+    _encoding = None
+
+client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+
+
+def count_tokens(text: str) -> int:
+    if _encoding is not None:
+        return len(_encoding.encode(text, disallowed_special=()))
+    return (len(text) + 3) // 4
+
+
+def _slice_tokens(text: str, start: int, end: int = None) -> str:
+    """Text of tokens[start:end]"""
+    if _encoding is not None:
+        tokens = _encoding.encode(text, disallowed_special=())
+        return _encoding.decode(tokens[start:end])
+    return text[start * 4 : end * 4 if end is not None else None]
+
+
+def compact_text(text) -> str:
+    """
+    Normalize parsed submission text: join spreadsheet rows, strip trailing
+    whitespace and collapse runs of blank lines. Content lines are never
+    dropped, a repeated line or row can be what is being graded.
+    Leading indentation is kept since it matters for code.
+    """
+    if isinstance(text, list):
+        text = "\n".join(text)
+
+    lines = []
+    for line in text.splitlines():
+        line = line.rstrip()
+        if not line and (not lines or not lines[-1]):
+            continue
+        lines.append(line)
+    return "\n".join(lines).strip()
+
+
+def chunk_text(text: str, chunk_tokens: int = SUBMISSION_CHUNK_TOKENS) -> list[str]:
+    """Split text on line boundaries into chunks of at most ~chunk_tokens tokens"""
+    chunks = []
+    current = []
+    current_tokens = 0
+    for line in text.split("\n"):
+        line_tokens = count_tokens(line) + 1
+        if current and current_tokens + line_tokens > chunk_tokens:
+            chunks.append("\n".join(current))
+            current = []
+            current_tokens = 0
+        # A single oversized line is split on its own
+        while line_tokens > chunk_tokens:
+            chunks.append(_slice_tokens(line, 0, chunk_tokens))
+            line = _slice_tokens(line, chunk_tokens)
+            line_tokens = count_tokens(line) + 1
+        current.append(line)
+        current_tokens += line_tokens
+    if current:
+        chunks.append("\n".join(current))
+    return chunks
+
+
+def truncate_text(text: str, budget: int) -> str:
+    """Keep the head and tail of the text within the token budget"""
+    total = count_tokens(text)
+    if total <= budget:
+        return text
+    head = int(budget * 0.75)
+    tail = budget - head
+    return (
+        _slice_tokens(text, 0, head)
+        + f"\n\n[... {total - budget} tokens truncated ...]\n\n"
+        + _slice_tokens(text, total - tail)
+    )
+
+
+def summarize_chunk(chunk: str, index: int, total: int) -> str:
+    response = client.chat.completions.create(
+        model=SUBMISSION_SUMMARY_MODEL,
+        messages=[
+            {
+                "role": "user",
+                "content": (
+                    f"This is part {index + 1} of {total} of a learner's task submission. "
+                    "Condense it for a grader: keep every deliverable, file, function, "
+                    "feature, result and notable defect, quote short key code or text "
+                    "verbatim, and drop boilerplate and repetition.\n\n" + chunk
+                ),
+            }
+        ],
+    )
+    record_openai_usage(SUBMISSION_SUMMARY_MODEL, response)
+    return response.choices[0].message.content.strip()
+
+
+def summarize_text(text: str, budget: int) -> str:
+    """Map: condense each chunk concurrently. Reduce: join the summaries in order"""
+    chunks = chunk_text(text)
+    with ThreadPoolExecutor(
+        max_workers=max(1, min(SUBMISSION_SUMMARY_CONCURRENCY, len(chunks)))
+    ) as executor:
+        summaries = list(
+            executor.map(
+                in_context(summarize_chunk),
+                chunks,
+                range(len(chunks)),
+                [len(chunks)] * len(chunks),
+            )
+        )
+    summary = "\n\n".join(
+        f"[Part {index + 1}/{len(chunks)}]\n{part}"
+        for index, part in enumerate(summaries)
+    )
+    # Summaries of a huge submission can still overflow the budget
+    return truncate_text(summary, budget)
+
+
+def preprocess_settings(budget=None, strategy=None):
+    """Resolved settings that change the preprocessed text, part of the result cache key"""
+    strategy = strategy or SUBMISSION_OVERFLOW_STRATEGY
+    settings = {
+        "token_budget": budget or SUBMISSION_TOKEN_BUDGET,
+        "overflow_strategy": strategy,
+        "chunk_tokens": SUBMISSION_CHUNK_TOKENS,
+        # Results graded on text compacted with duplicate line removal are stale
+        "compaction": "whitespace",
+    }
+    if strategy == "summarize":
+        settings["summary_model"] = SUBMISSION_SUMMARY_MODEL
+    return settings
+
+
+def preprocess_submission(text, budget=None, strategy=None):
+    """
+    Compact the parsed submission and fit it into the token budget.
+    Returns (text, token_stats) where token_stats reports what was used.
+    """
+    budget = budget or SUBMISSION_TOKEN_BUDGET
+    strategy = strategy or SUBMISSION_OVERFLOW_STRATEGY
+
+    original_tokens = count_tokens(
+        "\n".join(text) if isinstance(text, list) else text
+    )
+    text = compact_text(text)
+    compacted_tokens = count_tokens(text)
+
+    applied = "none"
+    if compacted_tokens > budget:
+        if strategy == "summarize":
+            try:
+                text = summarize_text(text, budget)
+                applied = "summarize"
+            except Exception as e:
+                print(f"Submission summarization failed, truncating instead: {e}")
+                text = truncate_text(text, budget)
+                applied = "truncate"
+        else:
+            text = truncate_text(text, budget)
+            applied = "truncate"
+
+    return text, {
+        "original": original_tokens,
+        "compacted": compacted_tokens,
+        "graded": count_tokens(text),
+        "budget": budget,
+        "strategy": applied,
+    }
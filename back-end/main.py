@@ -1,24 +1,68 @@
 from fastapi import FastAPI, HTTPException, Depends, Query
 from pydantic import BaseModel
-import requests
 import os
+import requests
+from contextlib import asynccontextmanager
 from dotenv import load_dotenv
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.concurrency import run_in_threadpool
 from generate_rubric_agent_2 import RubricGenerationAgent
-from AIGrader import AIGrader
+from AIGrader import get_grader, task_parse_cache
 from typing import List, Optional
 from urllib.parse import urlparse, unquote
-from helpers.downloader import download_and_parse_file
+from helpers.document_cache import document_cache
+from helpers.downloader import FileTooLargeError, download_to_file
+from helpers.parse_pool import parse_pool
+from helpers.result_cache import result_cache
+from helpers.cache import content_hash
+from helpers.single_flight import SingleFlight
+from helpers.bulk_grader import (
+    STATUS_FAILED,
+    STATUS_GRADED,
+    failed_result,
+    grade_solution,
+    grade_users,
+    grading_executor,
+    iter_grade_users,
+    parse_rubrics,
+)
+from helpers.jobs import get_job_runner
+from helpers.metabase import METABASE_URL, metabase
+from helpers.metrics import metrics
+from helpers.rubric_batch import (
+    BATCH_RUNNERS,
+    RUBRIC_BATCH_RUNNER,
+    RUBRIC_GENERATED,
+    generate_rubrics,
+    openai_batch_results,
+    submit_openai_batch,
+)
+from helpers.rubric_sink import get_rubric_sink
+from pydantics import GraderInput
 from supabase import Client
-from supabase_db import get_db
-import requests
+from supabase_db import aupsert_rubric, execute, get_db, rubric_cache
 import json
 
 load_dotenv()
 
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # One grader shared by all requests and worker threads
+    get_grader()
+    # Jobs persisted by the SQLite backend pick up where they left off, jobs of
+    # a worker that died are taken over once its lease runs out
+    job_watcher = get_job_runner().start()
+    try:
+        yield
+    finally:
+        job_watcher.cancel()
+        parse_pool.shutdown()
+        grading_executor.shutdown(wait=False, cancel_futures=True)
+
+
+app = FastAPI(lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -28,53 +72,13 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Environment variables
-METABASE_URL = os.getenv("METABASE_URL", "")
-USERNAME = os.getenv("METABASE_USERNAME", "")
-PASSWORD = os.getenv("METABASE_PASSWORD", "")
-DATABASE_ID = int(os.getenv("METABASE_DATABASE_ID", 2))
-
 
 # Request models
 class QueryRequest(BaseModel):
     sql: str
-
-
-def get_session_token():
-    login_url = f"{METABASE_URL}/api/session"
-    payload = {"username": USERNAME, "password": PASSWORD}
-    headers = {"Content-Type": "application/json"}
-
-    response = requests.post(login_url, headers=headers, json=payload)
-    if response.status_code != 200:
-        raise HTTPException(
-            status_code=response.status_code, detail="Failed to authenticate."
-        )
-    return response.json().get("id")
-
-
-def run_native_query(session_token: str, sql: str):
-    dataset_url = f"{METABASE_URL}/api/dataset/"
-    headers = {
-        "Content-Type": "application/json",
-        "X-Metabase-Session": session_token,
-    }
-    body = {
-        "database": DATABASE_ID,
-        "type": "native",
-        "native": {"query": sql},
-        "parameters": [],
-    }
-
-    response = requests.post(dataset_url, headers=headers, json=body)
-    if response.status_code not in [200, 202]:
-        raise HTTPException(
-            status_code=response.status_code, detail="Query execution failed."
-        )
-    return response.json()
-
-
-import requests
+    database_id: Optional[int] = None
+    # Set to false to bypass the query result cache
+    use_cache: bool = True
 
 
 @app.get("/")
@@ -87,126 +91,125 @@ def download_file(url: str = Query(...)):
     try:
         # Extract filename from the URL
         parsed_url = urlparse(url)
-        filename = os.path.basename(parsed_url.path)
-        filename = unquote(filename)  # decode URL-encoded characters
+        # decode URL-encoded characters first so an encoded "/" can't escape temp/
+        filename = os.path.basename(unquote(parsed_url.path))
+        if filename in ("", ".", ".."):
+            filename = "download"
 
-        # Save to ./temp/filename
+        # Stream to ./temp/filename in chunks, hashing on the way
         output_path = os.path.join("temp", filename)
-        os.makedirs("temp", exist_ok=True)
-
-        # Download and save file
-        response = requests.get(url)
-        response.raise_for_status()
-        with open(output_path, "wb") as f:
-            f.write(response.content)
+        downloaded = download_to_file(url, output_path)
 
-        return {"message": f"File downloaded to {output_path}"}
+        return {"message": f"File downloaded to {output_path}", **downloaded}
 
+    except FileTooLargeError as e:
+        return JSONResponse(status_code=413, content={"detail": str(e)})
+    except (TimeoutError, requests.exceptions.Timeout) as e:
+        # Our total deadline, or the connect/read timeout of a single request
+        return JSONResponse(status_code=504, content={"detail": str(e)})
     except Exception as e:
         return JSONResponse(status_code=500, content={"detail": str(e)})
 
 
 @app.get("/auth")
 def authenticate():
-    token = get_session_token()
+    token = metabase.session_token()
     return {"token": token}
 
 
-@app.post("/query")
-def query_metabase(request: QueryRequest):
-    token = get_session_token()
-    result = run_native_query(token, request.sql)
-    return JSONResponse(result)
+@app.get("/cache/stats")
+def cache_stats():
+    return {
+        "rubrics": rubric_cache.stats(),
+        "rubric_generations": rubric_generations.stats(),
+        "task_parse": task_parse_cache.stats(),
+        "grading_results": result_cache.stats() if result_cache else None,
+        "documents": document_cache.stats() if document_cache else None,
+        "metabase": metabase.stats(),
+    }
 
 
-# Grader
+def iter_query_rows(result, offset, limit):
+    """NDJSON lines: the column metadata first, then one line per row"""
+    data = result.get("data") or {}
+    rows = data.get("rows") or []
+    yield json.dumps({"cols": data.get("cols", []), "total_rows": len(rows)}) + "\n"
+    end = len(rows) if limit is None else offset + limit
+    for row in rows[offset:end]:
+        yield json.dumps(row, default=str) + "\n"
 
 
-# Pydantic models for request/response
-class GraderUser(BaseModel):
-    id: int
-    fullName: str
-    email: str
-    profilePicture: str | None
-    status: str
-    submissions: str | None
-    submissionId: int | None
+@app.get("/metrics")
+def prometheus_metrics():
+    """Stage latencies, LLM token usage and cost in the Prometheus text format"""
+    return PlainTextResponse(
+        metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
 
 
-class GraderInput(BaseModel):
-    task_description: str
-    journey_name: str
-    scope_rubric: str
-    requirements_rubric: str
-    solution: Optional[str] = None
-    solution_url: Optional[str] = None
-    users: List[GraderUser] = []
+@app.post("/query")
+def query_metabase(
+    request: QueryRequest,
+    format: str = Query("json"),
+    offset: int = Query(0, ge=0),
+    limit: Optional[int] = Query(None, ge=0),
+):
+    """
+    Run native SQL through Metabase. format=ndjson streams rows one per line;
+    offset/limit return a page of the rows.
+    """
+    if format not in ("json", "ndjson"):
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unsupported format: {format}. Use json or ndjson.",
+        )
+    result, cached = metabase.query(
+        request.sql, request.database_id, use_cache=request.use_cache
+    )
+    headers = {"X-Query-Cache": "hit" if cached else "miss"}
+
+    if format == "ndjson":
+        return StreamingResponse(
+            iter_query_rows(result, offset, limit),
+            media_type="application/x-ndjson",
+            headers=headers,
+        )
+
+    if offset or limit is not None:
+        # The cached result is shared, page a copy
+        data = dict(result.get("data") or {})
+        rows = data.get("rows") or []
+        total_rows = len(rows)
+        data["rows"] = rows[offset : None if limit is None else offset + limit]
+        result = {
+            **result,
+            "data": data,
+            "row_count": len(data["rows"]),
+            "total_rows": total_rows,
+            "offset": offset,
+            "limit": limit,
+        }
+    return JSONResponse(result, headers=headers)
+
+
+# Grader
 
 
 @app.post("/evaluate")
-def evaluate_submission(grader_input: GraderInput):
+async def evaluate_submission(grader_input: GraderInput):
     try:
-        # Initialize the AI Grader once (for efficiency)
-        grader = AIGrader()
         results = []
+        scope_rubric, requirements_rubric = parse_rubrics(grader_input)
 
-        # Parse rubrics if they are JSON strings
-        try:
-            scope_rubric = (
-                json.loads(grader_input.scope_rubric)
-                if isinstance(grader_input.scope_rubric, str)
-                else grader_input.scope_rubric
-            )
-            requirements_rubric = (
-                json.loads(grader_input.requirements_rubric)
-                if isinstance(grader_input.requirements_rubric, str)
-                else grader_input.requirements_rubric
-            )
-        except json.JSONDecodeError:
-            # If not valid JSON, use as string
-            scope_rubric = grader_input.scope_rubric
-            requirements_rubric = grader_input.requirements_rubric
-
-        # Case 1: Bulk grading with users
+        # Case 1: Bulk grading with users, graded concurrently
         if grader_input.users:
-            for user in grader_input.users:
-                if not user.submissions:
-                    # Skip users with no submission
-                    continue
-
-                # Download and parse the submission file
-                file_content = download_and_parse_file(user.submissions)
-                if not file_content:
-                    raise HTTPException(
-                        status_code=400,
-                        detail=f"Failed to download submission for user {user.id}",
-                    )
-
-                # Process the task for this user's submission
-                scope, quality = grader.process_tasks(
-                    grader_input.task_description,
-                    grader_input.journey_name,
-                    scope_rubric,
-                    requirements_rubric,
-                    solution=file_content,
-                )
-
-                # Append results for this user
-                results.append(
-                    {
-                        "user_id": user.id,
-                        "scope": {
-                            "criteria": scope["criteria"],
-                            "overall_grade": scope["scope_score"], 
-                            "overall_comment": scope["scope_comment"], 
-                        },
-                        "quality": {
-                            "criteria": quality["criteria"], 
-                            "overall_grade": quality["quality_score"], 
-                            "overall_comment": quality["quality_comment"],
-                        },
-                    }
-                )
+            results = await grade_users(
+                grader_input,
+                scope_rubric,
+                requirements_rubric,
+                max_concurrency=grader_input.max_concurrency,
+                timeout=grader_input.user_timeout,
+            )
 
             if not results:
                 raise HTTPException(
@@ -222,39 +225,11 @@ def evaluate_submission(grader_input: GraderInput):
                     detail="Either solution, solution_url, or users must be provided.",
                 )
 
-            # Use solution_url if provided, otherwise use solution directly
-            if grader_input.solution_url:
-                file_content = download_and_parse_file(grader_input.solution_url)
-                if not file_content:
-                    raise HTTPException(
-                        status_code=400,
-                        detail="Failed to download solution from solution_url.",
-                    )
-                grader_input.solution = file_content
-
-            # Process the single submission
-            scope, quality = grader.process_tasks(
-                grader_input.task_description,
-                grader_input.journey_name,
-                scope_rubric,
-                requirements_rubric,
-                grader_input.solution,
-            )
-
-            # Append single result (no user_id since no user context)
+            # Process the single submission (no user_id since no user context)
             results.append(
-                {
-                    "scope": {
-                        "criteria": scope["criteria"], 
-                        "overall_grade": scope["scope_score"], 
-                        "overall_comment": scope["scope_comment"], 
-                    },
-                    "quality": {
-                        "criteria": quality["criteria"], 
-                        "overall_grade": quality["quality_score"], 
-                        "overall_comment": quality["quality_comment"], 
-                    },
-                }
+                await run_in_threadpool(
+                    grade_solution, grader_input, scope_rubric, requirements_rubric
+                )
             )
 
         return results
@@ -263,12 +238,130 @@ def evaluate_submission(grader_input: GraderInput):
         raise HTTPException(status_code=500, detail=f"Grading error: {str(e)}")
 
 
+STREAM_MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "sse": "text/event-stream",
+}
+
+
+def format_stream_record(record, stream_format):
+    data = json.dumps(record)
+    if stream_format == "sse":
+        return f"event: result\ndata: {data}\n\n"
+    return f"{data}\n"
+
+
+@app.post("/evaluate/stream")
+async def evaluate_submission_stream(
+    grader_input: GraderInput, format: str = Query("ndjson")
+):
+    """Stream each user's grading result as soon as it is ready (NDJSON or SSE)"""
+    if format not in STREAM_MEDIA_TYPES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unsupported stream format: {format}. Use ndjson or sse.",
+        )
+    if grader_input.users:
+        if not any(user.submissions for user in grader_input.users):
+            raise HTTPException(
+                status_code=400,
+                detail="No valid submissions found in the users list.",
+            )
+    elif not grader_input.solution and not grader_input.solution_url:
+        raise HTTPException(
+            status_code=400,
+            detail="Either solution, solution_url, or users must be provided.",
+        )
+
+    scope_rubric, requirements_rubric = parse_rubrics(grader_input)
+
+    async def results():
+        if grader_input.users:
+            async for result in iter_grade_users(
+                grader_input,
+                scope_rubric,
+                requirements_rubric,
+                max_concurrency=grader_input.max_concurrency,
+                timeout=grader_input.user_timeout,
+            ):
+                yield format_stream_record(result, format)
+        else:
+            try:
+                result = await run_in_threadpool(
+                    grade_solution, grader_input, scope_rubric, requirements_rubric
+                )
+                result["status"] = STATUS_GRADED
+            except Exception as e:
+                error = getattr(e, "detail", None) or str(e)
+                result = failed_result(STATUS_FAILED, error)
+            yield format_stream_record(result, format)
+
+        if format == "sse":
+            yield "event: done\ndata: {}\n\n"
+
+    return StreamingResponse(
+        results(),
+        media_type=STREAM_MEDIA_TYPES[format],
+        # Keep proxies from buffering the stream
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+# Background grading jobs
+
+
+@app.post("/evaluate/jobs", status_code=202)
+async def create_evaluation_job(grader_input: GraderInput):
+    if grader_input.users:
+        if not any(user.submissions for user in grader_input.users):
+            raise HTTPException(
+                status_code=400,
+                detail="No valid submissions found in the users list.",
+            )
+    elif not grader_input.solution and not grader_input.solution_url:
+        raise HTTPException(
+            status_code=400,
+            detail="Either solution, solution_url, or users must be provided.",
+        )
+
+    job = get_job_runner().submit(grader_input)
+    return {
+        "job_id": job["job_id"],
+        "status": job["status"],
+        "total": job["total"],
+    }
+
+
+@app.get("/evaluate/jobs/{job_id}")
+def get_evaluation_job(job_id: str):
+    job = get_job_runner().store.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Grading job {job_id} not found")
+    return job
+
+
 #  Endpoint for rubric generation
 
 
 class RubricGenerationRequest(BaseModel):
     task_id: str
     task_description: str
+    # Save a newly generated rubric to the assignments table right away
+    persist: bool = False
+
+
+# Concurrent generations for the same task and description share one o3-mini call
+rubric_generations = SingleFlight()
+
+
+async def generate_and_persist_rubric(task_id, task_description, persist, supabase):
+    """One rubric generation, saved to the assignments table when persist is set"""
+    agent = RubricGenerationAgent()
+    rubric = await agent.arun([task_description], task_id=task_id)
+    # RUBRIC_SINK=db already saved it
+    if persist and not agent.sink.persists:
+        await aupsert_rubric(supabase, task_id, rubric)
+    return rubric
 
 
 @app.post("/generate_rubric")
@@ -277,14 +370,17 @@ async def generate_rubric(
 ):
     try:
         print("Generating rubric...")  # Debug log
+        cached_rubric = rubric_cache.get(request.task_id)
+        if cached_rubric is not None:
+            return {"rubric": cached_rubric}
+
         # Check for existing rubric in the database using task_id
-        existing_rubric = (
+        existing_rubric = await execute(
             supabase.table("assignments")
             .select(
                 "deliverable_rubric, quality_rubric, max_score, passed_score, final_score"
             )
             .eq("assignment_id", request.task_id)
-            .execute()
         )
 
         if existing_rubric.data:
@@ -293,19 +389,29 @@ async def generate_rubric(
             )
             quality_rubric = json.loads(existing_rubric.data[0]["quality_rubric"])
 
-            return {
-                "rubric": {
-                    "Scope": deliverable_rubric,
-                    "Quality": quality_rubric,
-                    "max_score": existing_rubric.data[0].get("max_score"),
-                    "passed_score": existing_rubric.data[0].get("passed_score"),
-                    "final_score": existing_rubric.data[0].get("final_score"),
-                }
+            rubric = {
+                "Scope": deliverable_rubric,
+                "Quality": quality_rubric,
+                "max_score": existing_rubric.data[0].get("max_score"),
+                "passed_score": existing_rubric.data[0].get("passed_score"),
+                "final_score": existing_rubric.data[0].get("final_score"),
             }
-
-        # Generate new rubric using the task description
-        agent = RubricGenerationAgent()
-        rubric = agent.run([request.task_description])
+            rubric_cache.set(request.task_id, rubric)
+            return {"rubric": rubric}
+
+        # Generate new rubric using the task description. The persist flag is
+        # part of the key so a saving generation is only shared by callers
+        # that asked for it, and saves once for all of them
+        rubric = await rubric_generations.do(
+            (
+                request.task_id,
+                content_hash(request.task_description),
+                request.persist,
+            ),
+            lambda: generate_and_persist_rubric(
+                request.task_id, request.task_description, request.persist, supabase
+            ),
+        )
         return {"rubric": rubric}
     except Exception as e:
         print(f"METABASE_URL: {METABASE_URL}")
@@ -315,6 +421,143 @@ async def generate_rubric(
         )
 
 
+class RubricBatchItem(BaseModel):
+    task_id: str
+    task_description: str
+
+
+class RubricBatchRequest(BaseModel):
+    items: List[RubricBatchItem]
+    # Save each valid rubric to the assignments table as soon as it is ready
+    persist: bool = False
+    # Report tasks that already have a rubric instead of regenerating them
+    skip_existing: bool = True
+    max_concurrency: Optional[int] = None
+    # "local" or "openai" (OpenAI Batch API), defaults to RUBRIC_BATCH_RUNNER
+    runner: Optional[str] = None
+
+
+async def persist_batch_record(record, persist, supabase):
+    """Save a generated rubric to the assignments table when asked to"""
+    # RUBRIC_SINK=db already saved generated rubrics
+    if not persist or record["status"] != RUBRIC_GENERATED or get_rubric_sink().persists:
+        return
+    try:
+        await aupsert_rubric(supabase, record["task_id"], record["rubric"])
+        record["persisted"] = True
+    except Exception as e:
+        record["persisted"] = False
+        record["errors"].append(f"Failed to save rubric: {e}")
+
+
+@app.post("/generate_rubric/batch")
+async def generate_rubric_batch(
+    request: RubricBatchRequest,
+    format: str = Query("ndjson"),
+    supabase: Client = Depends(get_db),
+):
+    """
+    Generate rubrics for many tasks, streaming each task's status as it finishes.
+    The "openai" runner submits an OpenAI batch job instead and answers 202 with
+    its batch_id; results are collected from /generate_rubric/batch/{batch_id}.
+    """
+    if format not in STREAM_MEDIA_TYPES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unsupported stream format: {format}. Use ndjson or sse.",
+        )
+    runner_name = (request.runner or RUBRIC_BATCH_RUNNER).lower()
+    if runner_name not in BATCH_RUNNERS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown rubric batch runner: {runner_name}. "
+            f"Expected one of {', '.join(BATCH_RUNNERS)}",
+        )
+    if not request.items:
+        raise HTTPException(status_code=400, detail="No tasks provided.")
+
+    # Last item wins when a task is listed twice
+    items = {item.task_id: item.dict() for item in request.items}
+
+    existing = set()
+    if request.skip_existing:
+        rows = await execute(
+            supabase.table("assignments")
+            .select("assignment_id")
+            .in_("assignment_id", list(items))
+        )
+        existing = {str(row["assignment_id"]) for row in rows.data}
+
+    existing_records = [
+        {"task_id": task_id, "status": "exists", "rubric": None, "errors": []}
+        for task_id in items
+        if task_id in existing
+    ]
+    pending = [item for task_id, item in items.items() if task_id not in existing]
+
+    if runner_name == "openai":
+        if not pending:
+            return {"batch_id": None, "status": "completed", "results": existing_records}
+        try:
+            batch = await submit_openai_batch(
+                pending, metadata={"persist": str(request.persist).lower()}
+            )
+        except Exception as e:
+            raise HTTPException(status_code=502, detail=f"Failed to submit rubric batch: {e}")
+        return JSONResponse(
+            status_code=202,
+            content={
+                "batch_id": batch.id,
+                "status": batch.status,
+                "status_url": f"/generate_rubric/batch/{batch.id}",
+                "results": existing_records,
+            },
+        )
+
+    runner = BATCH_RUNNERS[runner_name]()
+    if request.max_concurrency:
+        runner.max_concurrency = max(1, request.max_concurrency)
+
+    async def records():
+        for record in existing_records:
+            yield format_stream_record(record, format)
+
+        async for record in generate_rubrics(pending, runner=runner):
+            await persist_batch_record(record, request.persist, supabase)
+            yield format_stream_record(record, format)
+
+        if format == "sse":
+            yield "event: done\ndata: {}\n\n"
+
+    return StreamingResponse(
+        records(),
+        media_type=STREAM_MEDIA_TYPES[format],
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.get("/generate_rubric/batch/{batch_id}")
+async def get_rubric_batch(batch_id: str, supabase: Client = Depends(get_db)):
+    """Status of an OpenAI rubric batch job, with a record per task once it has ended"""
+    try:
+        batch, records = await openai_batch_results(batch_id)
+    except Exception as e:
+        raise HTTPException(status_code=502, detail=f"Failed to read rubric batch: {e}")
+
+    counts = batch.request_counts
+    response = {
+        "batch_id": batch.id,
+        "status": batch.status,
+        "request_counts": counts.model_dump() if counts else None,
+    }
+    if records is not None:
+        persist = (batch.metadata or {}).get("persist") == "true"
+        for record in records:
+            await persist_batch_record(record, persist, supabase)
+        response["results"] = records
+    return response
+
+
 # Supabase integration
 
 # Saving rubric to Supabase
@@ -334,25 +577,11 @@ async def save_rubric(request: RubricSaveRequest, supabase: Client = Depends(get
             "deliverable_rubric": request.deliverable_rubric,
             "quality_rubric": request.quality_rubric,
         }
-        # check if there is an existing assignment with the same task_id
-        existing_assignment = (
-            supabase.table("assignments")
-            .select("assignment_id")
-            .eq("assignment_id", request.task_id)
-            .execute()
+        # Single round trip: insert or update on the assignment_id key
+        await execute(
+            supabase.table("assignments").upsert(data, on_conflict="assignment_id")
         )
-
-        if existing_assignment.data:
-            # Update the existing assignment
-            supabase.table("assignments").update(
-                {
-                    "deliverable_rubric": request.deliverable_rubric,
-                    "quality_rubric": request.quality_rubric,
-                }
-            ).eq("assignment_id", request.task_id).execute()
-        else:
-            # Insert a new assignment
-            supabase.table("assignments").insert(data).execute()
+        rubric_cache.delete(request.task_id)
         return {"message": "Rubrics saved successfully!"}
     except Exception as e:
         return {"message": f"Hello World - Error querying database: {str(e)}"}
@@ -389,58 +618,49 @@ class SaveGradingResultsRequest(BaseModel):
     quality_criteria: List[CriterionModel]
 
 
+def grading_row(request: SaveGradingResultsRequest):
+    """users_grades row for a grading result"""
+    return {
+        "user_id": request.user_id,
+        "task_id": request.taskId,
+        "scope_score": request.scope_overall_grade,
+        "scope_comment": request.scope_overall_comment,
+        "quality_score": request.quality_overall_grade,
+        "quality_comment": request.quality_overall_comment,
+        "full_name": request.user.fullName,
+        "email": request.user.email,
+        "scope_criteria": json.dumps(
+            [criterion.dict() for criterion in request.scope_criteria]
+        ),
+        "quality_criteria": json.dumps(
+            [criterion.dict() for criterion in request.quality_criteria]
+        ),
+    }
+
+
+def valid_scores(request: SaveGradingResultsRequest):
+    return 0 <= request.scope_overall_grade <= 100 and (
+        0 <= request.quality_overall_grade <= 100
+    )
+
+
 @app.post("/save_grading_results")
 async def save_grading_results(
     request: SaveGradingResultsRequest, supabase: Client = Depends(get_db)
 ):
     try:
         # Validate scores
-        if not (0 <= request.scope_overall_grade <= 100) or not (
-            0 <= request.quality_overall_grade <= 100
-        ):
+        if not valid_scores(request):
             raise HTTPException(
                 status_code=400, detail="Scores must be between 0 and 100."
             )
 
-        # Prepare data for the users_grades table
-        grading_data = {
-            "user_id": request.user_id,
-            "task_id": request.taskId,
-            "scope_score": request.scope_overall_grade,
-            "scope_comment": request.scope_overall_comment,
-            "quality_score": request.quality_overall_grade,
-            "quality_comment": request.quality_overall_comment,
-            "full_name": request.user.fullName,
-            "email": request.user.email,
-            "scope_criteria": json.dumps(
-                [criterion.dict() for criterion in request.scope_criteria]
-            ),
-            "quality_criteria": json.dumps(
-                [criterion.dict() for criterion in request.quality_criteria]
-            ),
-        }
-
-        # Check if a grading record already exists for this user and task
-        existing_grade = (
-            supabase.table("users_grades")
-            .select("user_id, task_id")
-            .eq("user_id", request.user_id)
-            .eq("task_id", request.taskId)
-            .execute()
-        )
-
-        if existing_grade.data:
-            # Update existing record
-            response = (
-                supabase.table("users_grades")
-                .update(grading_data)
-                .eq("user_id", request.user_id)
-                .eq("task_id", request.taskId)
-                .execute()
+        # Single round trip: insert or update on the (user_id, task_id) key
+        response = await execute(
+            supabase.table("users_grades").upsert(
+                grading_row(request), on_conflict="user_id,task_id"
             )
-        else:
-            # Insert new record
-            response = supabase.table("users_grades").insert(grading_data).execute()
+        )
 
         # Check for errors in the Supabase response
         if not response.data:
@@ -454,3 +674,57 @@ async def save_grading_results(
         raise HTTPException(
             status_code=500, detail=f"Error saving grading results: {str(e)}"
         )
+
+
+@app.post("/save_grading_results/bulk")
+async def save_grading_results_bulk(
+    grading_results: List[SaveGradingResultsRequest],
+    supabase: Client = Depends(get_db),
+):
+    """Save a whole cohort's results with one batched upsert, reporting each row's status"""
+    statuses = []
+    # Keyed by (user_id, task_id): an upsert can't touch the same row twice,
+    # so a repeated learner keeps its last result
+    rows = {}
+    for request in grading_results:
+        status = {"user_id": request.user_id, "task_id": request.taskId}
+        if valid_scores(request):
+            rows[(request.user_id, request.taskId)] = grading_row(request)
+            status.update({"status": "saved", "error": None})
+        else:
+            status.update(
+                {"status": "invalid", "error": "Scores must be between 0 and 100."}
+            )
+        statuses.append(status)
+
+    if rows:
+        try:
+            response = await execute(
+                supabase.table("users_grades").upsert(
+                    list(rows.values()), on_conflict="user_id,task_id"
+                )
+            )
+            saved = {(row["user_id"], str(row["task_id"])) for row in response.data or []}
+            error = None
+        except Exception as e:
+            saved = set()
+            error = f"Error saving grading results: {str(e)}"
+
+        for status in statuses:
+            if status["status"] == "saved" and (
+                status["user_id"],
+                str(status["task_id"]),
+            ) not in saved:
+                status.update(
+                    {
+                        "status": "failed",
+                        "error": error
+                        or "Failed to save grading results to the database.",
+                    }
+                )
+
+    return {
+        "saved": sum(1 for status in statuses if status["status"] == "saved"),
+        "total": len(statuses),
+        "results": statuses,
+    }
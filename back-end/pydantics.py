@@ -1,6 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import List
-from typing import List, Union
+from typing import List, Literal, Optional, Union
 
 class RequirementsConfig(BaseModel):
     requirements_list: List[str] = Field(
@@ -28,3 +27,51 @@ class ScopeConfig(BaseModel):
 class ScopeScoringConfig(BaseModel):
     scope_score: Union[int, str] = Field(..., description="Scope Score")
     scope_comment: str = Field(..., description="Scope Comment")
+
+
+# Structured outputs of the direct grading engine
+class GradedCriterion(BaseModel):
+    name: str = Field(..., description="Criterion name exactly as in the rubric")
+    grade: int = Field(..., description="Grade within the chosen level's range")
+    chosen_level: int = Field(..., description="Chosen level number (1, 2, 3, etc.)")
+    comment: str = Field(..., description="Justification including the matched level")
+
+
+class QualityGradingResult(QualityScoringConfig):
+    criteria: List[GradedCriterion] = Field(..., description="Graded criteria")
+
+
+class ScopeGradingResult(ScopeScoringConfig):
+    criteria: List[GradedCriterion] = Field(..., description="Graded criteria")
+
+
+# /evaluate request models
+class GraderUser(BaseModel):
+    id: int
+    fullName: str
+    email: str
+    profilePicture: str | None
+    status: str
+    submissions: str | None
+    submissionId: int | None
+
+
+class GraderInput(BaseModel):
+    task_description: str
+    journey_name: str
+    scope_rubric: str
+    requirements_rubric: str
+    solution: Optional[str] = None
+    solution_url: Optional[str] = None
+    users: List[GraderUser] = []
+    # Bulk grading limits, fall back to GRADER_MAX_CONCURRENCY / GRADER_USER_TIMEOUT
+    max_concurrency: Optional[int] = None
+    user_timeout: Optional[float] = None
+    # Grade again even if an identical submission already has a cached result
+    force_regrade: bool = False
+    # "crew" runs the CrewAI agents, "direct" one structured-output call per score
+    engine: Literal["crew", "direct"] = "crew"
+    # Max submission tokens sent to the grader, falls back to SUBMISSION_TOKEN_BUDGET
+    token_budget: Optional[int] = None
+    # Attach per-stage timings, token usage and cost to each result
+    include_metrics: bool = False
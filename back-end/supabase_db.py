@@ -1,8 +1,12 @@
+import json
 import os
 from fastapi import HTTPException
+from fastapi.concurrency import run_in_threadpool
 from dotenv import load_dotenv
 from supabase import create_client
 
+from helpers.cache import LRUCache
+
 load_dotenv()
 
 # Supabase setup
@@ -36,3 +40,35 @@ def get_db():
     if not connect_to_db or supabase_client is None:
         raise HTTPException(status_code=503, detail="Database connection not available")
     return supabase_client
+
+
+async def execute(query):
+    """
+    Run a PostgREST query builder's blocking .execute() in the threadpool, so
+    async endpoints don't stall the event loop on the database round trip.
+    """
+    return await run_in_threadpool(query.execute)
+
+
+# Decoded rubrics from the assignments table, keyed by task_id. Rubric writes
+# invalidate the entry; the TTL bounds staleness across worker processes.
+RUBRIC_CACHE_TTL = float(os.getenv("RUBRIC_CACHE_TTL", 300))
+RUBRIC_CACHE_SIZE = int(os.getenv("RUBRIC_CACHE_SIZE", 512))
+rubric_cache = LRUCache(maxsize=RUBRIC_CACHE_SIZE, ttl=RUBRIC_CACHE_TTL)
+
+
+def upsert_rubric(client, task_id, rubric):
+    """Save a {"Scope", "Quality"} rubric to the assignments table (blocking)"""
+    client.table("assignments").upsert(
+        {
+            "assignment_id": task_id,
+            "deliverable_rubric": json.dumps(rubric["Scope"]),
+            "quality_rubric": json.dumps(rubric["Quality"]),
+        },
+        on_conflict="assignment_id",
+    ).execute()
+    rubric_cache.delete(task_id)
+
+
+async def aupsert_rubric(client, task_id, rubric):
+    await run_in_threadpool(upsert_rubric, client, task_id, rubric)
@@ -6,6 +6,7 @@ import { ArrowLeft, Download, Upload } from "lucide-react";
 import { Button } from "@/components/ui/button";
 import { toast } from "sonner";
 import { useTaskData } from "@/hooks/useTaskData";
+import { streamEvaluation } from "@/services/api";
 import UsersList from "@/components/UsersList";
 import { useUsers } from "@/hooks/useUsers";
 import { Textarea } from "@/components/ui/textarea";
@@ -206,13 +207,10 @@ export default function TaskSubmissionsPage() {
 
     setGrading(true);
     try {
-      const res = await fetch(`${BASE_URL}/evaluate`, {
-        method: "POST",
-        headers: {
-          "Content-Type": "application/json",
-          Accept: "application/json",
-        },
-        body: JSON.stringify({
+      // Show each user's result as soon as the back-end finishes grading them
+      const results: NewGradingResult[] = [];
+      await streamEvaluation(
+        {
           task_description: task?.description,
           scope_rubric: JSON.stringify(deliverableRubric),
           requirements_rubric: JSON.stringify(qualityRubric),
@@ -221,25 +219,15 @@ export default function TaskSubmissionsPage() {
             : { solution_url: solutionUrl }),
           journey_name: task?.title,
           users: selectedUsers,
-        }),
-      });
-
-      if (!res.ok) {
-        console.log("Error:", res);
-        toast.error("Error grading submissions. Please try again.");
-        return;
-      }
-      const ct = res.headers.get("content-type") || "";
-      if (!ct.includes("application/json")) {
-        const text = await res.text();
-        console.error("Expected JSON, got:", text);
-        return;
-      }
-      const data = await res.json();
-      console.log("Grading data:", data);
+        },
+        (result) => {
+          results.push(result as unknown as NewGradingResult);
+          setGradingResults([...results]);
+        }
+      );
+      console.log("Grading data:", results);
 
       toast.success("Grading completed successfully!");
-      setGradingResults(data);
     } catch (err) {
       console.error(err);
       toast.error("Error grading submissions. Please try again.");
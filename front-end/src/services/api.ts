@@ -41,3 +41,37 @@ export const checkApiHealth = async () => {
     };
   }
 };
+
+// Streams grading results from /evaluate/stream, calling onResult for each
+// user as soon as the back-end finishes grading them
+export const streamEvaluation = async (
+  payload: Record<string, unknown>,
+  onResult: (result: Record<string, unknown>) => void
+) => {
+  const response = await fetch(`${API_BASE_URL}/evaluate/stream?format=ndjson`, {
+    method: "POST",
+    headers: {
+      "Content-Type": "application/json",
+      Accept: "application/x-ndjson",
+    },
+    body: JSON.stringify(payload),
+  });
+  if (!response.ok || !response.body) {
+    throw new Error(`Streaming evaluation failed with status ${response.status}`);
+  }
+
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = "";
+  while (true) {
+    const { done, value } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+    const lines = buffer.split("\n");
+    buffer = lines.pop() ?? "";
+    for (const line of lines) {
+      if (line.trim()) onResult(JSON.parse(line));
+    }
+  }
+  if (buffer.trim()) onResult(JSON.parse(buffer));
+};